@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+'''
+Compares matching throughput of the ECB regex against the line matcher.
+
+Usage: python benchmarks/ecb_matcher.py [--records N ...]
+'''
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from benchmarks import synthetic
+from core import parser
+from core.matcher import RegexMatcher
+from module import ModuleController as mc
+
+
+def run(parmap, chunks, matcher):
+    begin = time.time()
+    count = 0
+    for start, end in chunks:
+        for _ in matcher.finditer(parmap, start, end):
+            count += 1
+    return count, time.time() - begin
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__)
+    argparser.add_argument('--records', type=int, nargs='+', default=[10000, 100000])
+    argparser.add_argument('--noise', type=float, default=0.5)
+    argparser.add_argument('--truncated', type=float, default=0.01)
+    argparser.add_argument('--stalled', type=int, default=0,
+                           help='Also append a section of this many restarted records')
+    args = argparser.parse_args()
+
+    module = mc().get_module('ECB', 'Throughput')
+    print("{:>10} {:>10} {:>14} {:>14} {:>10}".format(
+        'records', 'MB', 'regex MB/s', 'lines MB/s', 'malformed'))
+
+    for records in args.records:
+        fd, path = tempfile.mkstemp(suffix='.log')
+        try:
+            with os.fdopen(fd, 'w') as out:
+                synthetic.generate(out, records, noise=args.noise,
+                                   truncated=args.truncated, stalled=args.stalled)
+            size = os.path.getsize(path) / 1024.0 / 1024.0
+
+            inlog = parser.Parser(path, module)
+            parmap = inlog._open_file()
+            chunks = list(inlog._split_file(parmap))
+
+            regex_count, regex_time = run(parmap, chunks, RegexMatcher(module.pattern()))
+            matcher = module.matcher()
+            lines_count, lines_time = run(parmap, chunks, matcher)
+            parmap.close()
+
+            if regex_count != lines_count:
+                print("Mismatch: regex found {} records, line matcher {}".format(
+                    regex_count, lines_count))
+            print("{:>10} {:>10.1f} {:>14.1f} {:>14.1f} {:>10}".format(
+                records, size, size / regex_time, size / lines_time,
+                len(matcher.malformed)))
+        finally:
+            os.remove(path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+'''
+Measures import time of the entry points in fresh interpreters, and checks
+that parsing never loads matplotlib.
+
+Usage: python benchmarks/import_time.py [--repeat N] [--max-seconds S]
+Exits with 1 if an import is slower than --max-seconds or if the parse
+path loads matplotlib.
+'''
+
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+"""Imports to time, the parse path must not load matplotlib"""
+TARGETS = [
+    ('parse', 'from core import parser; from module import ModuleController as mc; '
+              'mc().get_module("ECB", "Throughput")', False),
+    ('cli', 'import logviz', False),
+    ('render', 'from core import viz; viz.pyplot(); '
+               'from mpl_toolkits.mplot3d import axes3d', True),
+]
+
+SCRIPT = '''
+import sys, time
+sys.path.insert(0, {root!r})
+begin = time.time()
+{statement}
+elapsed = time.time() - begin
+print("%f %d" % (elapsed, "matplotlib" in sys.modules))
+'''
+
+
+def measure(statement):
+    '''
+    Imports in a new interpreter.
+        :return: ``(seconds, matplotlib loaded)``
+    '''
+    output = subprocess.check_output(
+        [sys.executable, '-c', SCRIPT.format(root=ROOT, statement=statement)], cwd=ROOT)
+    elapsed, loaded = output.split()
+    return float(elapsed), loaded == b'1'
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__)
+    argparser.add_argument('--repeat', type=int, default=5)
+    argparser.add_argument('--max-seconds', type=float, default=None,
+                           help='Fail if importing the parse or cli path takes longer')
+    args = argparser.parse_args()
+
+    failed = False
+    print("{:<10} {:>10} {:>10}  {}".format('target', 'best s', 'median s', 'matplotlib'))
+    for name, statement, allowed in TARGETS:
+        runs = sorted(measure(statement) for _ in range(args.repeat))
+        times = [elapsed for elapsed, _ in runs]
+        loaded = any(loaded for _, loaded in runs)
+        print("{:<10} {:>10.3f} {:>10.3f}  {}".format(
+            name, times[0], times[len(times) // 2], 'loaded' if loaded else '-'))
+        if loaded and not allowed:
+            print("  {} path loads matplotlib".format(name))
+            failed = True
+        if not allowed and args.max_seconds is not None and times[0] > args.max_seconds:
+            print("  {} path is slower than {} s".format(name, args.max_seconds))
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
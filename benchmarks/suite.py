@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+'''
+Benchmarks parsing, aggregation and rendering on synthetic ECB logs of
+growing sizes, and compares the results against a stored baseline.
+
+Usage:
+    python benchmarks/suite.py --sizes 1MB 100MB 1GB --save-baseline base.json
+    python benchmarks/suite.py --sizes 1MB 100MB 1GB --baseline base.json
+
+Each size is measured --repeat times, each time in a fresh process so that
+peak memory is its own, and the best value of each metric is kept: noise
+of a shared machine only ever makes runs slower.
+Exits with 1 if a metric regressed by more than --tolerance.
+'''
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from benchmarks import synthetic
+from util import SizeUtils
+
+"""Metric => ``True`` if higher is better"""
+METRICS = {
+    'get_info MB/s': True,
+    'get_info records/s': True,
+    'split_info records/s': True,
+    'preprocess_data records/s': True,
+    'save s': False,
+    'peak RSS MB': False,
+}
+
+
+def measure(in_log):
+    '''
+    Measures one log, in the current process.
+        :return: ``Dictionary``-style metrics
+    '''
+    import resource
+    from core import parser
+    from core import viz
+    from module import ModuleController as mc
+
+    module = mc().get_module('ECB', 'Throughput')
+    size = os.path.getsize(in_log) / 1024.0 / 1024.0
+
+    begin = time.time()
+    inlog = parser.Parser(in_log, module)
+    info = inlog.get_info()
+    get_info = time.time() - begin
+
+    # split_info alone, on one batch of raw records
+    parmap = inlog._open_file()
+    matcher = module.matcher()
+    raw = []
+    for start, end in inlog._split_file(parmap):
+        raw.extend(matcher.finditer(parmap, start, end))
+        if len(raw) >= parser.Parser.BATCH_RECORDS:
+            break
+    parmap.close()
+    begin = time.time()
+    module.split_info(raw)
+    split_info = time.time() - begin
+
+    begin = time.time()
+    visualization = viz.Visualization(info, module)
+    preprocess = time.time() - begin
+
+    fd, output_path = tempfile.mkstemp(suffix='.pdf')
+    os.close(fd)
+    begin = time.time()
+    visualization.save(output_path)
+    save = time.time() - begin
+    os.remove(output_path)
+
+    return {
+        'MB': size,
+        'records': len(info),
+        'get_info MB/s': size / get_info,
+        'get_info records/s': len(info) / get_info,
+        'split_info records/s': len(raw) / split_info if split_info else 0,
+        'preprocess_data records/s': len(info) / preprocess if preprocess else 0,
+        'save s': save,
+        'peak RSS MB': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+    }
+
+
+def best(runs):
+    '''
+    Keeps the best value of each metric over repeated measures of a log.
+        :param runs: ``List``-style of outputs of :func:`measure`
+        :return: ``Dictionary``-style metrics
+    '''
+    metrics = dict(runs[0])
+    for metric, higher_is_better in METRICS.items():
+        values = [run[metric] for run in runs if metric in run]
+        if values:
+            metrics[metric] = max(values) if higher_is_better else min(values)
+    return metrics
+
+
+def synthetic_log(work_dir, size, seed):
+    '''
+    Generates a log of a given size, once.
+        :return: Path of the log
+    '''
+    path = os.path.join(work_dir, 'ecb-{}-{}.log'.format(size, seed))
+    if not os.path.exists(path):
+        temp = path + '.tmp'
+        with open(temp, 'w') as out:
+            synthetic.generate(out, None, seed=seed, noise=0.2, truncated=0.001,
+                               chunk_sizes=[2 ** i for i in range(14)],
+                               threads=[2 ** i for i in range(7)],
+                               max_bytes=SizeUtils.convert_size(size))
+        os.rename(temp, path)
+    return path
+
+
+def compare(results, baseline, tolerance):
+    '''
+    Finds metrics worse than the baseline by more than the tolerance.
+        :return: ``List``-style of messages
+    '''
+    regressions = []
+    for size, metrics in results.items():
+        if size not in baseline:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            old, new = baseline[size].get(metric), metrics.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (higher_is_better and change < -tolerance) or \
+                    (not higher_is_better and change > tolerance):
+                regressions.append("{} {}: {:.2f} -> {:.2f} ({:+.0%})".format(
+                    size, metric, old, new, change))
+    return regressions
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__,
+                                        formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument('--sizes', nargs='+', default=['1MB', '10MB', '100MB'],
+                           help='Sizes of the logs, up to e.g. 10GB')
+    argparser.add_argument('--seed', type=int, default=0)
+    argparser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'logviz-bench'),
+                           help='Directory keeping the generated logs between runs')
+    argparser.add_argument('--baseline', help='Results to compare against')
+    argparser.add_argument('--save-baseline', help='Write results to this file')
+    argparser.add_argument('--repeat', type=int, default=3,
+                           help='Number of times each size is measured, the best run is kept')
+    argparser.add_argument('--tolerance', type=float, default=0.2,
+                           help='Relative change reported as regression')
+    argparser.add_argument('--measure', help=argparse.SUPPRESS)
+    args = argparser.parse_args()
+
+    if args.measure:
+        json.dump(measure(args.measure), sys.stdout)
+        return
+
+    if not os.path.isdir(args.work_dir):
+        os.makedirs(args.work_dir)
+
+    results = {}
+    print("{:>8} {:>10} {:>9} {:>11} {:>11} {:>11} {:>7} {:>8}".format(
+        'size', 'records', 'MB/s', 'records/s', 'split_info', 'preprocess', 'save s', 'RSS MB'))
+    for size in args.sizes:
+        in_log = synthetic_log(args.work_dir, size, args.seed)
+        metrics = best([json.loads(subprocess.check_output(
+            [sys.executable, os.path.abspath(__file__), '--measure', in_log]))
+            for _ in range(max(args.repeat, 1))])
+        results[size] = metrics
+        print("{:>8} {:>10} {:>9.1f} {:>11.0f} {:>11.0f} {:>11.0f} {:>7.2f} {:>8.1f}".format(
+            size, metrics['records'], metrics['get_info MB/s'], metrics['get_info records/s'],
+            metrics['split_info records/s'], metrics['preprocess_data records/s'],
+            metrics['save s'], metrics['peak RSS MB']))
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as fhandle:
+            json.dump(results, fhandle, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as fhandle:
+            regressions = compare(results, json.load(fhandle), args.tolerance)
+        for regression in regressions:
+            print("Regression: " + regression)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+'''
+Deterministic generator of synthetic RawErasureCoderBenchmark logs.
+'''
+
+import argparse
+import itertools
+import os
+import random
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from util import SizeUtils
+
+DELIMETER = "**********"
+
+NOISE_LINES = [
+    "Java HotSpot(TM) 64-Bit Server VM warning: ignoring option MaxPermSize=256m",
+    "[GC (Allocation Failure)  524800K->1840K(2010112K), 0.0031420 secs]",
+    "WARN util.NativeCodeLoader: Unable to load native-hadoop library for your platform",
+    "Performing warm up...",
+]
+
+
+def record(out, rng, coder, method, buffer_mb, chunk_kb, threads, noise):
+    '''
+    Writes one complete record.
+    '''
+    out.write("Using {}MB buffer.\n".format(buffer_mb))
+    while rng.random() < noise:
+        out.write(rng.choice(NOISE_LINES) + "\n")
+    data_mb = 1024 * buffer_mb * threads
+    throughput = rng.uniform(500, 6000)
+    total = data_mb / throughput
+    times = sorted(rng.uniform(0.8, 1.0) * total for _ in range(4))
+    out.write("{} coder {} {}MB data, with chunk size {}KB\n".format(
+        coder, method, data_mb, chunk_kb))
+    out.write("Total time: {:.3f} s.\n".format(total))
+    out.write("Total throughput: {:.2f} MB/s\n".format(throughput))
+    out.write("Threads statistics: \n{} threads in total.\n".format(threads))
+    out.write("Min: {:.3f} s, Max: {:.3f} s, Avg: {:.3f} s, 90th Percentile: {:.3f} s.\n".format(
+        times[0], times[3], times[1], times[2]))
+
+
+def generate(out, records=None, seed=0, noise=0.0, truncated=0.0, stalled=0,
+             coders=("ISA-L",), methods=("encode", "decode"),
+             chunk_sizes=(64, 128, 256, 512, 1024), threads=(1, 2, 4, 8),
+             max_bytes=None):
+    '''
+    Writes a synthetic log, the same for the same arguments. The sweep over
+    coders, methods, threads and chunk sizes (in KB) is repeated until
+    enough records or bytes are written.
+        :param out: File-like object to write to
+        :param records: Number of records
+        :param max_bytes: Size of the log, instead of a number of records
+        :param noise: Probability of (each further) noise line in a record
+        :param truncated: Probability of a record being cut short
+        :param stalled: Number of restarted, never finished records in one \
+            trailing section (as left by a crashing benchmark harness)
+    '''
+    rng = random.Random(seed)
+    sweep = itertools.cycle(itertools.product(coders, methods, threads, chunk_sizes))
+    for coder, method, thread_num, chunk_kb in itertools.islice(sweep, records):
+        if max_bytes is not None and out.tell() >= max_bytes:
+            break
+        out.write(DELIMETER + "\n")
+        if rng.random() < truncated:
+            out.write("Using 1MB buffer.\n")
+            out.write("{} coder {} \n".format(coder, method))
+        else:
+            record(out, rng, coder, method, 1, chunk_kb, thread_num, noise)
+    out.write(DELIMETER + "\n")
+    for _ in range(stalled):
+        out.write("Using 1MB buffer.\n")
+        out.write(rng.choice(NOISE_LINES) + "\n")
+    if stalled:
+        out.write(DELIMETER + "\n")
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__)
+    argparser.add_argument('output', help='Log file to write')
+    argparser.add_argument('--records', type=int, default=None)
+    argparser.add_argument('--size', help='Size of the log instead of --records, e.g. 100MB')
+    argparser.add_argument('--seed', type=int, default=0)
+    argparser.add_argument('--noise', type=float, default=0.0)
+    argparser.add_argument('--truncated', type=float, default=0.0)
+    argparser.add_argument('--stalled', type=int, default=0)
+    argparser.add_argument('--coders', nargs='+', default=["ISA-L"])
+    argparser.add_argument('--chunk-sizes', type=int, nargs='+', default=[64, 128, 256, 512, 1024],
+                           help='Chunk sizes in KB')
+    argparser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = argparser.parse_args()
+
+    max_bytes = SizeUtils.convert_size(args.size) if args.size else None
+    records = args.records if args.records is not None or max_bytes else 1000
+    with open(args.output, 'w') as out:
+        generate(out, records, seed=args.seed, noise=args.noise,
+                 truncated=args.truncated, stalled=args.stalled, coders=args.coders,
+                 chunk_sizes=args.chunk_sizes, threads=args.threads, max_bytes=max_bytes)
+
+if __name__ == "__main__":
+    main()
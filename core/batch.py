@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+'''
+:mod:`core.batch` is a module containing class for visualizing many logs
+in one run.
+'''
+
+import glob
+import multiprocessing
+import os
+import time
+import traceback
+
+from core import history
+from core import parser
+from core import viz
+from module import ModuleController as mc
+
+
+class Batch(object):
+    '''
+    Renders several figures of many logs. Each log is parsed once and all
+    its figures are drawn from the same parsed data; logs are spread over
+    a pool of processes.
+        :param log_type: Module parsing the logs
+        :type log_type: str.
+        :param output_dir: Directory of the figures, named \\
+            ``<log name>_<sub type>.pdf``
+        :type output_dir: str.
+        :param jobs: Number of processes, ``0`` for one per CPU core
+        :type jobs: int.
+        :param cache: Cache of parsed files, none by default
+        :type cache: core.cache.ParseCache.
+        :param history: Database storing the results of every log, \
+            see :class:`core.history.History`, none by default
+        :type history: str.
+        :param renderers: Sub type => one of ``core.viz.RENDERERS``, key \
+            ``None`` for every sub type, the one of the module by default
+        :type renderers: dict.
+    '''
+
+    def __init__(self, log_type, output_dir, jobs=1, cache=None, history=None, renderers=None):
+        self.log_type = log_type
+        self.output_dir = output_dir
+        self.jobs = jobs or multiprocessing.cpu_count()
+        self.cache = cache
+        self.history = history
+        self.renderers = renderers
+
+    def run(self, entries):
+        '''
+        Renders logs.
+            :param entries: ``List``-style of ``(log, sub_types)``
+            :return: ``List``-style of ``Dictionary``-style timings, in \\
+                the order of entries
+        '''
+        if not os.path.isdir(self.output_dir):
+            os.makedirs(self.output_dir)
+
+        tasks = [(self.log_type, in_log, sub_types, self.output_dir, self.cache, self.history,
+                  self.renderers) for in_log, sub_types in entries]
+        if self.jobs == 1 or len(tasks) == 1:
+            return [_render_log(task) for task in tasks]
+
+        pool = multiprocessing.Pool(min(self.jobs, len(tasks)))
+        try:
+            return pool.map(_render_log, tasks, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+
+    @staticmethod
+    def summary(timings):
+        '''
+        Formats timings as a table, one line per log.
+            :return: ``str``
+        '''
+        lines = ["{:<40} {:>9} {:>9} {:>9}  {}".format(
+            'log', 'records', 'parse s', 'render s', 'status')]
+        for timing in timings:
+            lines.append("{:<40} {:>9} {:>9.2f} {:>9.2f}  {}".format(
+                os.path.basename(timing['log'])[-40:], timing['records'], timing['parse'],
+                sum(timing['render'].values()), timing['error'] or 'ok'))
+        lines.append("{:<40} {:>9} {:>9.2f} {:>9.2f}".format(
+            'total', sum(timing['records'] for timing in timings),
+            sum(timing['parse'] for timing in timings),
+            sum(sum(timing['render'].values()) for timing in timings)))
+        return "\n".join(lines)
+
+
+def read_manifest(path, sub_types):
+    '''
+    Reads a manifest of logs, one log (or glob of logs) per line, optionally
+    followed by the sub types to render; blank lines and ``#`` comments are
+    ignored.
+        :param sub_types: Sub types of logs listed without any
+        :return: ``List``-style of ``(log, sub_types)``
+    '''
+    entries = []
+    with open(path) as manifest:
+        for line in manifest:
+            fields = line.split('#', 1)[0].split()
+            if fields:
+                entries.extend(expand([fields[0]], fields[1:] or sub_types))
+    return entries
+
+
+def expand(patterns, sub_types):
+    '''
+    Expands globs of logs.
+        :return: ``List``-style of ``(log, sub_types)``
+    '''
+    entries = []
+    for pattern in patterns:
+        logs = sorted(glob.glob(pattern)) or [pattern]
+        entries.extend((in_log, list(sub_types)) for in_log in logs)
+    return entries
+
+
+def _render_log(task):
+    '''
+    Parses a log and renders all its figures, in a worker process of
+    :meth:`Batch.run`.
+        :param task: ``(log_type, log, sub_types, output_dir, cache, history, \
+            renderers)``
+        :return: ``Dictionary``-style timings
+    '''
+    log_type, in_log, sub_types, output_dir, cache, history_path, renderers = task
+    timing = {'log': in_log, 'records': 0, 'parse': 0.0, 'render': {}, 'error': None}
+    controller = mc()
+    name = os.path.splitext(os.path.basename(in_log))[0]
+
+    try:
+        begin = time.time()
+        info = parser.Parser(in_log, controller.get_module(log_type, sub_types[0]),
+                             cache=cache).get_info()
+        timing['parse'] = time.time() - begin
+        if info is False:
+            raise Exception("Couldn't parse file {}".format(in_log))
+        timing['records'] = len(info)
+
+        for sub_type in sub_types:
+            begin = time.time()
+            module = controller.get_module(log_type, sub_type)
+            module.renderer = viz.pick_renderer(renderers, sub_type, module.renderer)
+            output_path = os.path.join(output_dir, '{}_{}.pdf'.format(name, sub_type))
+            viz.Visualization(info, module).save(output_path)
+            if history_path is not None:
+                store = history.History(history_path)
+                try:
+                    store.add(in_log, log_type, sub_type, module)
+                finally:
+                    store.close()
+            timing['render'][sub_type] = time.time() - begin
+    except Exception:
+        timing['error'] = traceback.format_exc().strip().splitlines()[-1]
+
+    return timing
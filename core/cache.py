@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+'''
+:mod:`core.cache` is a module containing the on-disk cache of parsed logs.
+'''
+
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+from core.records import Records
+
+
+class ParseCache(object):
+    '''
+    Cache of parsed records, one ``.npz`` file per log. Entries are keyed on
+    the identity of the log (path, size, mtime) and of the module parsing
+    it, so a changed log or parser never hits a stale entry. Least recently
+    used entries are evicted once the cache grows over its size.
+        :param directory: Directory holding the cache
+        :type directory: str.
+        :param max_bytes: Size of the cache
+        :type max_bytes: int.
+    '''
+
+    DEFAULT_DIRECTORY = os.path.join(os.path.expanduser('~'), '.cache', 'logviz')
+    DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+    SUFFIX = '.npz'
+
+    def __init__(self, directory=DEFAULT_DIRECTORY, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def key(self, filename, module):
+        '''
+        Returns the cache key of a log parsed by a module.
+        '''
+        stat = os.stat(filename)
+        identity = (os.path.abspath(filename), stat.st_size, stat.st_mtime,
+                    type(module).__name__, module.version())
+        return hashlib.sha1(repr(identity).encode('utf-8')).hexdigest()
+
+    def load(self, key):
+        '''
+        Loads parsed log.
+            :param key: Key of the log, see :meth:`key`
+            :return: ``(records, malformed)``, ``None`` if not cached
+        '''
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as fhandle:
+                arrays = np.load(fhandle)
+                arrays = dict((name, arrays[name]) for name in arrays.files)
+        except (IOError, OSError, ValueError):
+            return None
+
+        # Reading does not always update atime, mark as recently used
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+        malformed = list(zip(arrays.pop('malformed:offset').tolist(),
+                             arrays.pop('malformed:reason').tolist()))
+        return (Records.from_arrays(arrays), malformed)
+
+    def store(self, key, records, malformed):
+        '''
+        Stores parsed log, then evicts old entries if needed.
+            :param key: Key of the log, taken before parsing it
+        '''
+        if not os.path.isdir(self.directory):
+            try:
+                os.makedirs(self.directory)
+            except OSError:
+                if not os.path.isdir(self.directory):
+                    raise
+
+        arrays = records.to_arrays()
+        arrays['malformed:offset'] = np.array([offset for offset, _ in malformed], dtype=np.int64)
+        arrays['malformed:reason'] = np.array([reason for _, reason in malformed], dtype=str)
+
+        # Written aside then renamed, readers never see partial entries
+        fd, temp = tempfile.mkstemp(prefix='.', suffix=self.SUFFIX, dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as fhandle:
+                np.savez_compressed(fhandle, **arrays)
+            os.rename(temp, self._path(key))
+        except Exception:
+            os.remove(temp)
+            raise
+
+        self.evict()
+
+    def evict(self):
+        '''
+        Removes least recently used entries until the cache fits its size.
+        '''
+        entries = []
+        for name in os.listdir(self.directory):
+            # Entries being written start with a dot
+            if name.startswith('.') or not name.endswith(self.SUFFIX):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            total -= size
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.SUFFIX)
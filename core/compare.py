@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+'''
+:mod:`core.compare` is a module containing class for comparing logs.
+'''
+
+import numpy as np
+
+from core.records import Records
+from core.timing import profiler
+from core.viz import Visualization, plot_path, pyplot
+
+
+class Comparison(object):
+    '''
+    Visualization of several logs in one figure, e.g. one log per coder or
+    per build. All records are merged and aggregated in a single pass.
+        :param datasets: ``List``-style of ``(label, Records)``, one per log
+        :type datasets: list.
+        :param module: Module used to visualize the logs
+        :type module: object.
+        :param by: ``'coder'`` to compare coders found in the logs, \\
+            ``'source'`` to compare the logs themselves
+        :type by: str.
+    '''
+
+    MODES = ['surface', 'speedup', 'delta']
+
+    def __init__(self, datasets, module, by='coder'):
+        if not datasets:
+            raise Exception("Should give at least one log to compare.")
+        self.module = module
+        self.by = by
+
+        parts = []
+        for label, data in datasets:
+            columns = dict(data.columns)
+            columns['source'] = np.zeros(len(data), dtype=Records.CODE_DTYPE)
+            categories = dict(data.categories)
+            categories['source'] = [label]
+            parts.append(Records(columns, categories))
+
+        with profiler.stage('merge'):
+            self.data = Records.concatenate(parts)
+        with profiler.stage('compare_data'):
+            self.module.compare_data(self.data, by)
+        profiler.count('compare_data', records=len(self.data))
+
+    def check(self, mode='surface', reference=None):
+        '''
+        Tells why the logs can't be compared in a mode, if they can't.
+            :return: Message, ``None`` if they can
+        '''
+        labels = self.module.labels
+        if mode not in self.MODES:
+            return "{} is not one of {}".format(mode, self.MODES)
+        if reference is not None and reference not in labels:
+            return "Reference {} is not one of {}".format(reference, ", ".join(labels))
+        if mode != 'surface' and len(labels) < 2:
+            return "A {} needs at least two {} to compare, found {}".format(
+                mode, "logs" if self.by == 'source' else "coders", ", ".join(labels))
+        return None
+
+    def save(self, output_path, mode='surface', reference=None,
+             output_type=Visualization.PDF_OUTPUT):
+        problem = self.check(mode, reference)
+        if problem is not None:
+            raise Exception(problem)
+
+        with profiler.stage('import'):
+            plt = pyplot()
+            from matplotlib.backends.backend_pdf import PdfPages
+
+        num_plots = self.module.num_plots()
+        with profiler.stage('generate_ticks'):
+            self.module.generate_ticks()
+
+        fig = plt.figure()
+        pp = PdfPages(output_path) if output_type == Visualization.PDF_OUTPUT else None
+        try:
+            for plot in range(num_plots):
+                # Heatmaps add subplots and colorbars, each plot starts over
+                fig.clf()
+                with profiler.stage('paint'):
+                    self.module.paint_comparison(fig, mode, reference, plot)
+
+                with profiler.stage('save'):
+                    if output_type == Visualization.PDF_OUTPUT:
+                        pp.savefig(fig)
+                    elif output_type == Visualization.PNG_OUTPUT:
+                        fig.savefig(plot_path(output_path, self.module, plot, num_plots))
+        finally:
+            if pp is not None:
+                pp.close()
+            plt.close(fig)
@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+'''
+:mod:`core.export` is a module containing functions for exporting
+aggregated results without matplotlib, as JSON or as a self-contained HTML
+viewer.
+'''
+
+import json
+import math
+
+import numpy as np
+
+
+def bins(count, max_bins):
+    '''
+    Splits positions into consecutive bins of equal size.
+        :param count: Number of positions, e.g. of chunk sizes
+        :param max_bins: Largest number of bins
+        :return: ``numpy.ndarray`` of the first position of each bin
+    '''
+    step = max(int(math.ceil(count / float(max(max_bins, 1)))), 1)
+    return np.arange(0, count, step)
+
+
+def bin_labels(labels, starts):
+    '''
+    Names bins after their first and last labels.
+        :return: ``List``-style of ``str``, e.g. ``1KB`` or ``1KB-8KB``
+    '''
+    ends = list(starts[1:]) + [len(labels)]
+    return [str(labels[start]) if end - start == 1 else
+            '{}-{}'.format(labels[start], labels[end - 1])
+            for start, end in zip(starts, ends)]
+
+
+def downsample(grid, rows, columns):
+    '''
+    Averages cells of a grid over bins of rows and columns, ignoring NaN.
+        :param grid: 2-D ``numpy.ndarray``
+        :param rows: First row of each bin, see :func:`bins`
+        :param columns: First column of each bin
+        :return: 2-D ``numpy.ndarray``, NaN for bins without values
+    '''
+    known = ~np.isnan(grid)
+    sums = np.add.reduceat(np.add.reduceat(np.where(known, grid, 0), rows, axis=0),
+                           columns, axis=1)
+    counts = np.add.reduceat(np.add.reduceat(known.astype(np.int64), rows, axis=0),
+                             columns, axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return sums / counts
+
+
+def compact(grid, digits=4):
+    '''
+    Converts a grid into nested lists for JSON, values rounded to a number
+    of significant digits and NaN replaced by ``None``.
+    '''
+    text = '{:.%dg}' % digits
+    return [[None if np.isnan(value) else float(text.format(value)) for value in row]
+            for row in grid.tolist()]
+
+
+def write_json(data, output_path):
+    '''
+    Writes exported data as compact JSON.
+        :param data: Output of a module ``export_data()``
+    '''
+    with open(output_path, 'w') as fhandle:
+        json.dump(data, fhandle, separators=(',', ':'), sort_keys=True)
+
+
+def html(data):
+    '''
+    Inlines exported data in a viewer, a single HTML page needing nothing
+    else.
+        :param data: Output of a module ``export_data()``
+        :return: ``str``
+    '''
+    # Data is inlined in a script, it must not close it
+    payload = json.dumps(data, separators=(',', ':'), sort_keys=True).replace('</', '<\\/')
+    title = data['title'].replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+    return HTML_VIEWER.replace('{{title}}', title).replace('{{data}}', payload)
+
+
+def write_html(data, output_path):
+    '''
+    Writes exported data along with a viewer, see :func:`html`.
+    '''
+    with open(output_path, 'w') as fhandle:
+        fhandle.write(html(data))
+
+
+"""Heatmap viewer, one plot at a time, values shown on hover"""
+HTML_VIEWER = '''<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{{title}}</title>
+<style>
+body { font-family: sans-serif; margin: 20px; }
+#plot { position: relative; }
+#tooltip { position: absolute; background: #fff; border: 1px solid #888;
+           padding: 2px 6px; font-size: 12px; pointer-events: none; display: none; }
+canvas { display: block; }
+</style>
+</head>
+<body>
+<h2 id="heading"></h2>
+<select id="plots"></select>
+<div id="plot"><canvas id="canvas"></canvas><div id="tooltip"></div></div>
+<script>
+var data = {{data}};
+var margin = {left: 90, right: 90, top: 10, bottom: 90};
+var cell = Math.max(8, Math.min(48, Math.floor(720 / Math.max(data.x.length, 1))));
+var canvas = document.getElementById('canvas');
+var context = canvas.getContext('2d');
+var tooltip = document.getElementById('tooltip');
+var select = document.getElementById('plots');
+canvas.width = margin.left + cell * data.x.length + margin.right;
+canvas.height = margin.top + cell * data.y.length + margin.bottom;
+document.getElementById('heading').textContent = data.title + (data.coder ? ' - ' + data.coder : '') +
+    (data.note ? ' (' + data.note + ')' : '');
+data.plots.forEach(function (plot, index) {
+  var option = document.createElement('option');
+  option.value = index;
+  option.textContent = plot.name;
+  select.appendChild(option);
+});
+
+function color(ratio) {
+  // From dark blue to yellow
+  var stops = [[68, 1, 84], [59, 82, 139], [33, 145, 140], [94, 201, 98], [253, 231, 37]];
+  var position = Math.max(0, Math.min(1, ratio)) * (stops.length - 1);
+  var low = Math.floor(position), high = Math.min(low + 1, stops.length - 1);
+  var t = position - low;
+  return 'rgb(' + stops[low].map(function (value, i) {
+    return Math.round(value + (stops[high][i] - value) * t);
+  }).join(',') + ')';
+}
+
+function range(z) {
+  var min = Infinity, max = -Infinity;
+  z.forEach(function (row) { row.forEach(function (value) {
+    if (value !== null) { min = Math.min(min, value); max = Math.max(max, value); }
+  }); });
+  return [min, max];
+}
+
+function draw() {
+  var z = data.plots[select.value].z;
+  var bounds = range(z);
+  var span = bounds[1] - bounds[0] || 1;
+  context.clearRect(0, 0, canvas.width, canvas.height);
+  context.font = '11px sans-serif';
+  for (var row = 0; row < data.y.length; row++) {
+    for (var column = 0; column < data.x.length; column++) {
+      var value = z[row][column];
+      context.fillStyle = value === null ? '#eee' : color((value - bounds[0]) / span);
+      // First row at the bottom, like the PDF figures
+      context.fillRect(margin.left + column * cell, margin.top + (data.y.length - 1 - row) * cell,
+                       cell - 1, cell - 1);
+    }
+  }
+  context.fillStyle = '#000';
+  context.textAlign = 'right';
+  context.textBaseline = 'middle';
+  data.y.forEach(function (label, row) {
+    context.fillText(label, margin.left - 6, margin.top + (data.y.length - 0.5 - row) * cell);
+  });
+  data.x.forEach(function (label, column) {
+    context.save();
+    context.translate(margin.left + (column + 0.5) * cell, margin.top + data.y.length * cell + 6);
+    context.rotate(-Math.PI / 2);
+    context.fillText(label, 0, 0);
+    context.restore();
+  });
+  context.textAlign = 'center';
+  context.fillText(data.xlabel, margin.left + data.x.length * cell / 2, canvas.height - 10);
+  context.save();
+  context.translate(14, margin.top + data.y.length * cell / 2);
+  context.rotate(-Math.PI / 2);
+  context.fillText(data.ylabel, 0, 0);
+  context.restore();
+  // Color scale
+  var left = margin.left + data.x.length * cell + 20, height = data.y.length * cell;
+  for (var i = 0; i < height; i++) {
+    context.fillStyle = color(1 - i / height);
+    context.fillRect(left, margin.top + i, 14, 1);
+  }
+  context.fillStyle = '#000';
+  context.textAlign = 'left';
+  if (bounds[0] <= bounds[1]) {
+    context.fillText(bounds[1].toPrecision(4), left + 18, margin.top + 6);
+    context.fillText(bounds[0].toPrecision(4), left + 18, margin.top + height - 6);
+  }
+  context.fillText(data.unit, left, margin.top + height + 16);
+}
+
+canvas.addEventListener('mousemove', function (event) {
+  var box = canvas.getBoundingClientRect();
+  var column = Math.floor((event.clientX - box.left - margin.left) / cell);
+  var row = data.y.length - 1 - Math.floor((event.clientY - box.top - margin.top) / cell);
+  if (column < 0 || column >= data.x.length || row < 0 || row >= data.y.length) {
+    tooltip.style.display = 'none';
+    return;
+  }
+  var value = data.plots[select.value].z[row][column];
+  tooltip.textContent = data.xlabel + ' ' + data.x[column] + ', ' + data.ylabel + ' ' +
+      data.y[row] + ': ' + (value === null ? 'no run' : value + ' ' + data.unit);
+  tooltip.style.left = (event.clientX - box.left + 12) + 'px';
+  tooltip.style.top = (event.clientY - box.top + 12) + 'px';
+  tooltip.style.display = 'block';
+});
+canvas.addEventListener('mouseleave', function () { tooltip.style.display = 'none'; });
+select.addEventListener('change', draw);
+draw();
+</script>
+</body>
+</html>
+'''
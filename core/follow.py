@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+'''
+:mod:`core.follow` is a module containing class for visualizing logs which
+are still being written.
+'''
+
+import time
+
+from core import viz
+
+
+class Follower(object):
+    '''
+    Polls a log, parses the sections appended to it and renders the
+    figure again, at most once per interval.
+        :param parser: Parser of the log
+        :type parser: core.parser.Parser.
+        :param module: Module used to parse and visualize the log
+        :type module: object.
+        :param output_path: Output file, rewritten on every render
+        :type output_path: str.
+        :param interval: Minimum number of seconds between renders
+        :type interval: float.
+        :param poll: Number of seconds between checks of the log
+        :type poll: float.
+    '''
+
+    def __init__(self, parser, module, output_path, output_type=viz.Visualization.PDF_OUTPUT,
+                 interval=30, poll=2):
+        self.parser = parser
+        self.module = module
+        self.output_path = output_path
+        self.output_type = output_type
+        self.interval = interval
+        self.poll = poll
+        self.visualization = None
+        self.rendered = 0
+
+    def poll_once(self, final=False):
+        '''
+        Parses new sections of the log, if any.
+            :return: ``True`` if there was new data
+        '''
+        info = self.parser.update(final=final)
+        if info is None:
+            return False
+
+        if self.visualization is None:
+            self.visualization = viz.Visualization(info, self.module)
+        else:
+            self.visualization.update(info)
+        return True
+
+    def render(self):
+        self.visualization.save(self.output_path, output_type=self.output_type)
+        self.rendered = time.time()
+
+    def run(self):
+        '''
+        Follows the log until interrupted, then renders the end of it.
+        '''
+        pending = False
+        try:
+            while True:
+                pending = self.poll_once() or pending
+                if pending and time.time() - self.rendered >= self.interval:
+                    self.render()
+                    pending = False
+                time.sleep(self.poll)
+        except KeyboardInterrupt:
+            pending = self.poll_once(final=True) or pending
+            if pending:
+                self.render()
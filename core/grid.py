@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+'''
+:mod:`core.grid` is a module containing functions for laying aggregated
+results of a sweep out on dense grids, one cell per (x, y) pair.
+'''
+
+import numpy as np
+
+
+def dense_grids(stats, plot_keys, x_key, xdata, y_key, ydata, labels=None):
+    '''
+    Scatters the means of an aggregate into one dense grid per plot, and
+    per label if any, at once. Cells without runs are NaN.
+        :param stats: ``Aggregate`` over the plot keys, x and y keys
+        :param plot_keys: Key names telling plots apart, e.g. ``['method']``
+        :param xdata: Sorted values of the x key, one column each
+        :param ydata: Sorted values of the y key, one row each
+        :param labels: Sorted values of the ``label`` key, if any
+        :return: ``(plots, grids)``, sorted ``tuple`` of key values of each \
+            plot and ``numpy.ndarray`` of shape (labels, plots, y, x)
+    '''
+    if plot_keys:
+        keys = list(zip(*[stats.keys[name].tolist() for name in plot_keys]))
+    else:
+        keys = [()] * len(stats)
+    plots = sorted(set(keys))
+    index = dict((plot, position) for position, plot in enumerate(plots))
+
+    plot = np.array([index[key] for key in keys], dtype=np.int64)
+    label = np.zeros(len(plot), dtype=np.int64)
+    if labels is not None:
+        label = np.searchsorted(labels, stats.keys['label'])
+    grids = np.full((len(labels or [None]), len(plots), len(ydata), len(xdata)), np.nan)
+    grids[label, plot, np.searchsorted(ydata, stats.keys[y_key]),
+          np.searchsorted(xdata, stats.keys[x_key])] = stats.mean
+    return (plots, grids)
+
+
+def fill_gaps(grid):
+    '''
+    Interpolates cells between runs linearly, along rows then along
+    columns. Cells outside of the runs stay NaN.
+        :return: Filled copy of the grid
+    '''
+    grid = grid.copy()
+    for cells in (grid, grid.T):
+        for row in cells:
+            known = np.flatnonzero(~np.isnan(row))
+            if len(known) < 2:
+                continue
+            gaps = np.arange(known[0], known[-1] + 1)
+            row[gaps] = np.interp(gaps, known, row[known])
+    return grid
+
+
+def tick_steps(count, max_ticks=15):
+    '''
+    Positions of ticks of an axis, at most about ``max_ticks`` of them.
+        :return: ``numpy.ndarray``
+    '''
+    return np.arange(0, count, max(count // max_ticks, 1))
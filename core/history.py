@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+'''
+:mod:`core.history` is a module containing the store of aggregated results
+of past logs, for drawing trends over builds without parsing them again.
+'''
+
+import datetime
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+"""Tables and indexes of the store, created on first use"""
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    log TEXT NOT NULL,
+    build TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    module TEXT NOT NULL,
+    sub_type TEXT NOT NULL,
+    coder TEXT,
+    unit TEXT,
+    higher_is_better INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    run INTEGER NOT NULL REFERENCES runs (id),
+    method TEXT NOT NULL,
+    blocks INTEGER NOT NULL,
+    chunk_size INTEGER NOT NULL,
+    threads_num INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    mean REAL NOT NULL,
+    min REAL NOT NULL,
+    max REAL NOT NULL,
+    std REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_coder ON runs (module, sub_type, coder, timestamp);
+CREATE UNIQUE INDEX IF NOT EXISTS runs_log ON runs (log, build, module, sub_type);
+CREATE INDEX IF NOT EXISTS results_run ON results (run);
+CREATE INDEX IF NOT EXISTS results_cell ON results (method, chunk_size, threads_num);
+'''
+
+"""Formats accepted for timestamps, besides seconds since the epoch"""
+TIME_FORMATS = ['%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d']
+
+
+class History(object):
+    '''
+    SQLite store of aggregated results, one run per log and sub type, with
+    the statistics of every cell of its sweep (see ``history_data()`` of
+    modules). Adding a log again with the same build replaces its run.
+        :param path: Database file, created if missing
+        :type path: str.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        # Batch workers may write at the same time, SQLite locks the file
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def add(self, in_log, log_type, sub_type, module, build=None, timestamp=None):
+        '''
+        Stores the results of a log, once the module preprocessed it.
+            :param build: Build the log comes from, name of the log by default
+            :param timestamp: Seconds since the epoch, mtime of the log by default
+            :return: Number of cells stored
+        '''
+        data = module.history_data()
+        if build is None:
+            build = os.path.splitext(os.path.basename(in_log))[0]
+        if timestamp is None:
+            timestamp = os.path.getmtime(in_log)
+        in_log = os.path.abspath(in_log)
+
+        with self.connection:
+            self.connection.execute(
+                'DELETE FROM results WHERE run IN (SELECT id FROM runs WHERE log = ? AND build = ? '
+                'AND module = ? AND sub_type = ?)', (in_log, build, log_type, sub_type))
+            self.connection.execute(
+                'DELETE FROM runs WHERE log = ? AND build = ? AND module = ? AND sub_type = ?',
+                (in_log, build, log_type, sub_type))
+            run = self.connection.execute(
+                'INSERT INTO runs (log, build, timestamp, module, sub_type, coder, unit, '
+                'higher_is_better) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (in_log, build, timestamp, log_type, sub_type, data['coder'], data['unit'],
+                 int(data['higher_is_better']))).lastrowid
+            self.connection.executemany(
+                'INSERT INTO results (run, method, blocks, chunk_size, threads_num, count, mean, '
+                'min, max, std) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [(run,) + tuple(row) for row in data['rows']])
+        return len(data['rows'])
+
+    def trend(self, log_type, sub_type, coder=None, method=None, chunk_size=None,
+              threads_num=None, since=None):
+        '''
+        Queries the mean value of runs over time, averaged over the cells
+        of their sweep which hold the conditions.
+            :return: ``(series, unit, higher_is_better)``, series is \\
+                ``(coder, method)`` => ``List``-style of \\
+                ``(timestamp, build, value)`` in order of time
+        '''
+        conditions = ['runs.module = ?', 'runs.sub_type = ?']
+        values = [log_type, sub_type]
+        for column, value in [('runs.coder', coder), ('results.method', method),
+                              ('results.chunk_size', chunk_size),
+                              ('results.threads_num', threads_num)]:
+            if value is not None:
+                conditions.append('{} = ?'.format(column))
+                values.append(value)
+        if since is not None:
+            conditions.append('runs.timestamp >= ?')
+            values.append(since)
+
+        rows = self.connection.execute(
+            'SELECT runs.coder, results.method, runs.timestamp, runs.build, AVG(results.mean), '
+            'runs.unit, runs.higher_is_better FROM runs JOIN results ON results.run = runs.id '
+            'WHERE {} GROUP BY runs.id, results.method ORDER BY runs.timestamp, runs.id'
+            .format(' AND '.join(conditions)), values).fetchall()
+
+        series = {}
+        unit = None
+        higher_is_better = True
+        for coder, method, timestamp, build, value, unit, higher_is_better in rows:
+            series.setdefault((coder, method), []).append((timestamp, build, value))
+        return (series, unit, bool(higher_is_better))
+
+
+def regressions(series, higher_is_better, window=5, tolerance=0.1):
+    '''
+    Finds runs worse than the median of the runs before them by more than
+    the tolerance.
+        :param series: Output of :meth:`History.trend`
+        :param window: Number of earlier runs the median is taken over, \\
+            runs with fewer earlier runs are not checked
+        :param tolerance: Relative change reported as regression
+        :return: ``List``-style of ``(coder, method, timestamp, build, \\
+            value, baseline, change)``
+    '''
+    found = []
+    for (coder, method), points in sorted(series.items()):
+        values = [value for _, _, value in points]
+        for index in range(window, len(points)):
+            baseline = np.median(values[index - window:index])
+            if not baseline:
+                continue
+            change = (values[index] - baseline) / baseline
+            if (higher_is_better and change < -tolerance) or \
+                    (not higher_is_better and change > tolerance):
+                timestamp, build, value = points[index]
+                found.append((coder, method, timestamp, build, value, baseline, change))
+    return found
+
+
+def save_trend(series, found, output_path, title, unit):
+    '''
+    Draws one line per coder and method over time, regressions marked.
+        :param found: Output of :func:`regressions`
+    '''
+    from core.viz import pyplot
+    plt = pyplot()
+
+    fig = plt.figure(figsize=(10, 5))
+    ax = fig.gca()
+    for (coder, method), points in sorted(series.items()):
+        dates = [datetime.datetime.fromtimestamp(timestamp) for timestamp, _, _ in points]
+        ax.plot(dates, [value for _, _, value in points], marker='.',
+                label='{} {}'.format(coder, method))
+    for coder, method, timestamp, build, value, _, change in found:
+        date = datetime.datetime.fromtimestamp(timestamp)
+        ax.plot([date], [value], 'rv', markersize=8)
+        ax.annotate('{} ({:+.0%})'.format(build, change), (date, value), fontsize=6,
+                    xytext=(4, -10), textcoords='offset points', color='r')
+
+    ax.set_title(title)
+    ax.set_ylabel(unit or '')
+    ax.grid(True, alpha=0.3)
+    if series:
+        ax.legend(loc='best', fontsize=8)
+    fig.autofmt_xdate()
+    fig.savefig(output_path)
+    plt.close(fig)
+
+
+def parse_time(text):
+    '''
+    Reads a timestamp, in seconds since the epoch or e.g. ``2018-04-05 10:00``.
+        :return: Seconds since the epoch, ``None`` for ``None``
+    '''
+    if text is None:
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    for time_format in TIME_FORMATS:
+        try:
+            return time.mktime(datetime.datetime.strptime(text, time_format).timetuple())
+        except ValueError:
+            continue
+    raise Exception("Cannot read time {!r}, expected e.g. 2018-04-05 10:00".format(text))
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+'''
+:mod:`core.index` is a module containing the sidecar index of parsed logs,
+which lets selective queries parse only the sections they need.
+'''
+
+import os
+import stat
+import tempfile
+
+import numpy as np
+
+from core.records import Records
+
+
+class SidecarIndex(object):
+    '''
+    Index of the records of a log, stored next to it in ``<log>.lvidx``:
+    byte range of the section holding each record, and its key fields (see
+    ``index_fields()`` of modules). Entries record the identity of the log
+    (size, mtime) and of the module parsing it, stale ones are ignored.
+    Indexes get the permissions of their log, logs in read-only
+    directories are simply not indexed.
+    '''
+
+    SUFFIX = '.lvidx'
+
+    def identity(self, filename, module):
+        '''
+        Returns the identity of a log parsed by a module, to be taken
+        before parsing it.
+        '''
+        stat = os.stat(filename)
+        return repr((stat.st_size, stat.st_mtime, type(module).__name__, module.version()))
+
+    def load(self, filename, module):
+        '''
+        Loads the index of a log.
+            :return: ``(offsets, records)``, ``(start, end)`` of the section \
+                of each record and ``Records`` of their key fields, ``None`` \
+                if the log isn't indexed or changed since
+        '''
+        try:
+            identity = self.identity(filename, module)
+            with open(self.path(filename), 'rb') as fhandle:
+                arrays = np.load(fhandle)
+                arrays = dict((name, arrays[name]) for name in arrays.files)
+        except (IOError, OSError, ValueError):
+            return None
+
+        if str(arrays.pop('identity')) != identity:
+            return None
+        return (arrays.pop('offsets'), Records.from_arrays(arrays))
+
+    def store(self, filename, module, identity, offsets, records):
+        '''
+        Stores the index of a log.
+            :param identity: Identity of the log, see :meth:`identity`
+            :param offsets: ``(start, end)`` of the section of each record
+            :param records: ``Records`` of the log, only key fields are kept
+        '''
+        fields = module.index_fields()
+        keys = Records(dict((field, records[field]) for field in fields),
+                       dict((field, records.labels(field)) for field in fields
+                            if field in records.categories))
+        arrays = keys.to_arrays()
+        arrays['offsets'] = offsets
+        arrays['identity'] = np.array(identity)
+
+        # Written aside then renamed, readers never see partial indexes
+        directory = os.path.dirname(os.path.abspath(filename))
+        if not os.access(directory, os.W_OK | os.X_OK):
+            return False
+        try:
+            fd, temp = tempfile.mkstemp(prefix='.', suffix=self.SUFFIX, dir=directory)
+        except (IOError, OSError):
+            return False
+        try:
+            with os.fdopen(fd, 'wb') as fhandle:
+                np.savez_compressed(fhandle, **arrays)
+            # Readable by whoever can read the log, mkstemp() makes it private
+            os.chmod(temp, stat.S_IMODE(os.stat(filename).st_mode))
+            os.rename(temp, self.path(filename))
+        except Exception:
+            os.remove(temp)
+            raise
+        return True
+
+    def path(self, filename):
+        return filename + self.SUFFIX
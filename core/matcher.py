@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+'''
+:mod:`core.matcher` is a module containing classes for matching records in
+sections of log files.
+'''
+
+import re
+
+"""Size of the blocks of a section split into lines at once, in bytes"""
+BLOCK_SIZE = 1 << 22
+
+
+class RegexMatcher(object):
+    '''
+    Matches records with a single regex over the whole section.
+        :param pattern: Compiled pattern with one named group per field
+        :type pattern: re.RegexObject.
+    '''
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.malformed = []
+
+    def finditer(self, data, start, end):
+        '''
+        Finds records between two offsets of data.
+            :param data: Log file content, ``str`` or ``mmap``
+            :return: Generator of ``Dictionary``-style records
+        '''
+        for match in self.pattern.finditer(data, start, end):
+            yield match.groupdict()
+
+
+class LineMatcher(object):
+    '''
+    Matches records line by line with a state machine, so matching is
+    linear in the size of the section whatever noise it contains.
+        :param steps: ``(anchor, regex)`` per record line, in order. A line
+            is only matched against the regex if it contains the anchor.
+            A step is skipped if all its fields are already known.
+        :type steps: list.
+        :param gaps: Steps that may be preceded by unrelated lines
+        :type gaps: tuple.
+    '''
+
+    def __init__(self, steps, gaps=()):
+        self.steps = [(anchor, re.compile(regex)) for anchor, regex in steps]
+        self.gaps = frozenset(gaps)
+        self._names = [tuple(regex.groupindex) for _, regex in self.steps]
+        # Only steps whose fields may also come from earlier steps can be skipped
+        self._optional = frozenset(
+            index for index, names in enumerate(self._names) if names and set(names) <=
+            set(name for earlier in self._names[:index] for name in earlier))
+        self.malformed = []
+        """(:obj:`list` of :obj:`tuple`): ``(offset, reason)`` of records
+        which were started but could not be completed"""
+
+    def finditer(self, data, start, end):
+        '''
+        Finds records between two offsets of data.
+            :param data: Log file content, ``str`` or ``mmap``
+            :return: Generator of ``Dictionary``-style records
+        '''
+        steps = self.steps
+        first_anchor, first_regex = steps[0]
+        state = 0
+        fields = None
+        record = start
+        pos = start
+
+        for line in _lines(data, start, end):
+            eol = pos + len(line) + 1
+            line = line.rstrip()
+
+            if state:
+                anchor, regex = steps[state]
+                match = regex.match(line) if anchor in line else None
+                if match:
+                    fields.update(match.groupdict())
+                    state = self._skip(state + 1, fields)
+                    if state == len(steps):
+                        yield fields
+                        state = 0
+                    pos = eol
+                    continue
+                if state in self.gaps and not (first_anchor in line and first_regex.match(line)):
+                    pos = eol
+                    continue
+                self.malformed.append((record, "unexpected line {!r}, expected {!r}".format(
+                    line[:80], anchor)))
+                state = 0
+
+            # Not in a record, look for the first line of one
+            if first_anchor in line:
+                match = first_regex.match(line)
+                if match:
+                    fields = match.groupdict()
+                    record = pos
+                    state = self._skip(1, fields)
+                    if state == len(steps):
+                        yield fields
+                        state = 0
+
+            pos = eol
+
+        if state:
+            self.malformed.append((record, "truncated record, expected {!r}".format(
+                steps[state][0])))
+
+    def _skip(self, state, fields):
+        '''
+        Skips the optional steps whose fields are already known.
+            :return: Next state
+        '''
+        while state in self._optional \
+                and all(fields.get(key) is not None for key in self._names[state]):
+            state += 1
+        return state
+
+
+def _lines(data, start, end):
+    '''
+    Splits a section into lines, as ``data[start:end].split('\\n')`` would,
+    a block at a time: splitting a block is much cheaper than a find() per
+    line, and only one block is copied at once however large the section.
+        :return: Generator of ``str``
+    '''
+    while True:
+        split = data.find('\n', start + BLOCK_SIZE, end) if end - start > BLOCK_SIZE else -1
+        if split < 0:
+            for line in data[start:end].split('\n'):
+                yield line
+            return
+        for line in data[start:split].split('\n'):
+            yield line
+        start = split + 1
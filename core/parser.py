@@ -3,13 +3,21 @@
 :mod:`core.parser` is a module containing class for parsing log files.
 '''
 
+import bz2
+import collections
+import gzip
 import mmap
+import multiprocessing
 import os
 import re
 import traceback
 import platform
-from types import ListType
 
+import numpy as np
+
+from core import query
+from core.records import Records
+from core.timing import profiler
 from module import ModuleController as mc
 
 class Parser(object):
@@ -19,13 +27,48 @@ class Parser(object):
         :type filename: str.
         :param module: Current module used to parse file
         :type module: object.
+        :param jobs: Number of processes parsing the file, ``0`` for one \
+            per CPU core
+        :type jobs: int.
+        :param cache: Cache of parsed files, none by default
+        :type cache: core.cache.ParseCache.
+        :param index: Index of the records of parsed files, none by default
+        :type index: core.index.SidecarIndex.
+        :param filters: Predicates records must hold, those on indexed \
+            fields are used to parse only the sections of matching records
+        :type filters: list.
     '''
 
-    def __init__(self, filename='', module=None):
+    """Number of byte ranges given to each process, for load balancing"""
+    RANGES_PER_JOB = 4
+
+    """Number of raw records converted by the module at once"""
+    BATCH_RECORDS = 65536
+
+    """Number of bytes decompressed at once from compressed logs"""
+    STREAM_BUFFER = 16 * 1024 * 1024
+
+    """Number of ``STREAM_BUFFER`` kept at most while looking for a delimeter"""
+    STREAM_WINDOWS = 4
+
+    """Size of each window parsed by a preview, by default"""
+    PREVIEW_BYTES = 1024 * 1024
+
+    def __init__(self, filename='', module=None, jobs=1, cache=None, index=None, filters=None):
         if module is None:
             raise Exception("Should choose a module to parse the log file.")
         self._info = {}
+        self._malformed = []
+        self._skipped = (0, 0)
         self._module = module
+        self._jobs = jobs or multiprocessing.cpu_count()
+        self._cache = cache
+        self._index = index
+        self._filters = filters or []
+        self._offsets = None
+        self._windows = None
+        self._coverage = None
+        self._offset = 0
         self.__filename = filename
 
         return None
@@ -37,13 +80,52 @@ class Parser(object):
             ``False`` if it failed (at any point)
         '''
 
-        # We first split file into pieces
-        searchunks = self._split_file()
+        stream = self._open_compressed()
+        if stream is not None:
+            try:
+                if self._jobs > 1:
+                    with profiler.stage('parse (pool)'):
+                        self._info = self._parse_stream_parallel(stream)
+                    profiler.count('parse (pool)', records=len(self._info))
+                else:
+                    self._info = self._parse_windows(
+                        (window, self._split_file(window, 0, cut), base)
+                        for window, cut, base in self._stream_windows(stream))
+            finally:
+                stream.close()
+            # Offsets in a compressed log can't be sought, it isn't indexed
+            self._offsets = None
+            return True
+
+        parmap = self._open_file()
+
+        if parmap:
+
+            if self._windows is not None:
+                try:
+                    self._info = self._parse_rest(parmap)
+                finally:
+                    parmap.close()
+                return True
 
-        if searchunks:
+            ranges = [(0, parmap.size())]
+            if self._jobs > 1:
+                ranges = self._split_ranges(parmap, self._jobs * self.RANGES_PER_JOB)
 
-            # And then we parse pieces into meaningful data
-            self._info = self._parse_file(searchunks)
+            if len(ranges) > 1:
+                # Workers map the file on their own
+                parmap.close()
+                with profiler.stage('parse (pool)'):
+                    self._info = self._parse_parallel(ranges)
+                profiler.count('parse (pool)', records=len(self._info))
+                return True
+
+            try:
+                # Chunks are produced lazily and parsed as soon as they
+                # are found, so no copy of the file is kept in memory
+                self._info = self._parse_file(parmap, self._split_file(parmap))
+            finally:
+                parmap.close()
 
             return True
 
@@ -53,131 +135,541 @@ class Parser(object):
     def get_info(self):
         '''
         Returns parsed info
-            :return: ``Dictionary``-style list of data
+            :return: ``Records`` of data
         '''
 
+        if self._cache is not None:
+            # Taken before parsing, a log changing meanwhile is not cached
+            key = self._cache.key(self.__filename, self._module)
+            with profiler.stage('cache'):
+                cached = self._cache.load(key)
+            if cached is not None:
+                self._info, self._malformed = cached
+                return self._select()
+
+        if self._filters and self._index is not None:
+            with profiler.stage('index'):
+                info = self._load_indexed()
+            if info is not None:
+                self._info = info
+                return self._select()
+
+        if self._index is not None:
+            identity = self._index.identity(self.__filename, self._module)
         file_parsed = self.load_file()
         if file_parsed:
-            return self._info
+            if self._cache is not None:
+                self._cache.store(key, self._info, self._malformed)
+            if self._offsets is not None and len(self._info):
+                self._index.store(self.__filename, self._module, identity,
+                                  self._offsets, self._info)
+            return self._select()
         else:
             return False
 
-    def _split_file(self):
+    def preview(self, windows=16, window_bytes=PREVIEW_BYTES):
         '''
-        Splits log file (in ASCII format) in order to accelerate processing speed.
-            :param data: Input data instead of file
-            :type data: str.
-            :return: ``List``-style of file sections
+        Parses evenly spaced windows of the log only, for a quick look at
+        huge logs. Windows start and end on the module delimeter, so that
+        sections are never cut. A later ``get_info()`` parses the rest of
+        the log only, and reuses the windows.
+            :param windows: Number of windows
+            :param window_bytes: Size of each window, before realigning it
+            :return: ``Records`` of the windows, ``False`` if the log can't \
+                be mapped
         '''
 
-        # Filename passed checks through __init__
-        if self.__filename and os.access(self.__filename, os.R_OK):
+        if windows < 1:
+            raise Exception("Should preview at least one window, not {}".format(windows))
+        if _compression(self.__filename) is not None:
+            raise Exception("Cannot preview compressed file {}, it can't be sought"
+                            .format(self.__filename))
 
-            fhandle = None
+        parmap = self._open_file()
+        if not parmap:
+            return False
 
-            try:
-                fhandle = os.open(self.__filename, os.O_RDONLY)
-            except OSError:
-                raise Exception(("Couldn't open file {}".format(self.__filename)))
+        try:
+            with profiler.stage('preview'):
+                self._windows = [(start, end, self._parse_part(parmap, start, end))
+                                 for start, end in self._sample_ranges(parmap, windows,
+                                                                       window_bytes)]
+            size = parmap.size()
+        finally:
+            parmap.close()
+
+        parsed = [part for _, _, part in self._windows]
+        self._merge_parts(parsed)
+        self._coverage = (sum(end - start for start, end, _ in self._windows), size)
+        self._info = Records.concatenate([part_info for part_info, _, _, _ in parsed])
+        profiler.count('preview', bytes=self._coverage[0], chunks=len(self._windows),
+                       records=len(self._info))
+        return self._select()
+
+    def get_coverage(self):
+        '''
+        Returns how much of the log was parsed, e.g. by a preview
+            :return: ``(parsed bytes, bytes of the log)``, ``None`` before \
+                any preview
+        '''
 
-            if fhandle:
+        return self._coverage
 
-                datalength = 0
+    def update(self, final=False):
+        '''
+        Parses sections completed since the last update, for logs still
+        being written. A section is complete once the delimeter after it
+        is written, so only data behind the last delimeter is read.
+            :param final: Also parse the section after the last delimeter
+            :return: ``Records`` of the new sections, ``None`` if there are \
+                none yet
+        '''
 
-                # Dealing with mmap difference on Windows and Linux
-                if platform.system() == 'Windows':
-                    dataprot = mmap.ACCESS_READ
-                else:
-                    dataprot = mmap.PROT_READ
+        if not os.path.isfile(self.__filename) \
+                or os.path.getsize(self.__filename) <= self._offset:
+            return None
+        if _compression(self.__filename) is not None:
+            raise Exception("Cannot follow compressed file {}".format(self.__filename))
 
-                try:
-                    if platform.system() == 'Windows':
-                        parmap = mmap.mmap(
-                            fhandle, length=datalength, access=dataprot
-                        )
-                    else:
-                        parmap = mmap.mmap(
-                            fhandle, length=datalength, prot=dataprot
-                        )
-                except (TypeError, IndexError):
-                    os.close(fhandle)
-                    traceback.print_exc()
-                    return False
-
-                # Here we'll store chunks of file, unparsed
-                searchunks = []
-                oldchunkpos = 0
-                dlpos = parmap.find(self._module.delimeter(), 0)
-                size = 0
-
-                # We can do mmap.size() only on read-only mmaps
-                size = parmap.size()
-
-                while dlpos > -1:  # mmap.find() returns -1 on failure.
-
-                    tempchunk = parmap.read(dlpos - oldchunkpos)
-                    searchunks.append(tempchunk.strip())
-
-                    # We remember position, add 2 for 2 DD's
-                    # (newspaces in production). We have to remember
-                    # relative value
-                    oldchunkpos += (dlpos - oldchunkpos) + 2
-
-                    # We position to new place, to be behind \n\n
-                    # we've looked for.
-                    try:
-                        parmap.seek(2, os.SEEK_CUR)
-                    except ValueError:
-                        print(("Out of bounds ({})!\n".format(parmap.tell())))
-                    # Now we repeat find.
-                    dlpos = parmap.find(self._module.delimeter())
-
-                # If it wasn't the end of file, we want last piece of it
-                if oldchunkpos < size:
-                    tempchunk = parmap[(oldchunkpos):]
-                    searchunks.append(tempchunk.strip())
+        parmap = self._open_file()
+        if not parmap:
+            return None
 
-                parmap.close()
+        try:
+            delimeter = self._module.delimeter()
+            end = parmap.size() if final else parmap.rfind(delimeter, self._offset)
+            if end == -1 or end <= self._offset:
+                return None
+
+            malformed = self._malformed
+            info = self._parse_file(parmap, self._split_file(parmap, self._offset, end))
+            self._malformed = malformed + self._malformed
+            self._offset = end + len(delimeter)
+        finally:
+            parmap.close()
 
-            if fhandle != -1:
-                os.close(fhandle)
+        return info if len(info) else None
+
+    def _select(self):
+        '''
+        Keeps parsed records holding the filters.
+            :return: ``Records`` of data
+        '''
 
-            if searchunks:
-                return searchunks
+        if self._filters and len(self._info):
+            self._info = self._info.take(query.select(self._info, self._filters))
+        return self._info
+
+    def _load_indexed(self):
+        '''
+        Parses only the sections of records whose indexed fields hold the
+        filters, the other filters are checked once they are parsed.
+            :return: ``Records`` of the sections, ``None`` if the log isn't \
+                indexed or no filter is on an indexed field
+        '''
+
+        loaded = self._index.load(self.__filename, self._module)
+        if loaded is None:
+            return None
+        offsets, keys = loaded
+        pushed = [predicate for predicate in self._filters if predicate.field in keys]
+        if not pushed:
+            return None
+
+        # Sections holding several records are parsed once
+        offsets = offsets[query.select(keys, pushed)]
+        starts, first = np.unique(offsets[:, 0], return_index=True)
+        sections = list(zip(starts.tolist(), offsets[first, 1].tolist()))
+        profiler.count('index', records=len(offsets), chunks=len(sections),
+                       bytes=int((offsets[first, 1] - starts).sum()))
+
+        parmap = self._open_file()
+        if not parmap:
+            return None
+        try:
+            return self._parse_file(parmap, iter(sections))
+        finally:
+            parmap.close()
+
+    def get_skipped(self):
+        '''
+        Returns sections which were not matched, for lacking the anchors
+        of the module, see ``anchors()`` of the module
+            :return: ``(sections, bytes)``
+        '''
+
+        return self._skipped
+
+    def get_malformed(self):
+        '''
+        Returns records which were started but could not be parsed
+            :return: ``List``-style of ``(offset, reason)``
+        '''
+
+        return self._malformed
+
+    def _open_file(self):
+        '''
+        Maps log file (in ASCII format) into memory read-only.
+            :return: ``mmap`` of the whole file, ``False`` if it failed
+        '''
+
+        # Filename passed checks through __init__
+        if not (self.__filename and os.access(self.__filename, os.R_OK)):
+            return False
+
+        try:
+            fhandle = os.open(self.__filename, os.O_RDONLY)
+        except OSError:
+            raise Exception(("Couldn't open file {}".format(self.__filename)))
+
+        datalength = 0
+
+        try:
+            # Dealing with mmap difference on Windows and Linux
+            if platform.system() == 'Windows':
+                parmap = mmap.mmap(
+                    fhandle, length=datalength, access=mmap.ACCESS_READ
+                )
             else:
-                return False
+                parmap = mmap.mmap(
+                    fhandle, length=datalength, prot=mmap.PROT_READ
+                )
+        except (TypeError, IndexError, ValueError):
+            traceback.print_exc()
+            return False
+        finally:
+            # The mapping keeps its own reference to the file
+            os.close(fhandle)
 
-        return False
+        return parmap
 
-    def _parse_file(self, parts):
+    def _open_compressed(self):
         '''
-        Parses splitted file to get proper information from split parts.
-            :param sar_parts: Array of SAR file parts
-            :return: ``Dictionary``-style info (but still non-parsed) \
-                from SAR file, split into sections we want to check
+        Opens log file for streaming decompression, if it is compressed.
+            :return: File-like object of the decompressed log, ``None`` if \
+                the log is not compressed
         '''
-        pattern = None
-        # If parts is a list
-        if type(parts) is ListType:
-            pattern = self._module.pattern()
 
-            if pattern is None:
-                return False
+        if not (self.__filename and os.access(self.__filename, os.R_OK)):
+            return None
 
-            results = []
-            for part in parts:
-                matches = pattern.finditer(part)
-                for matchNum, match in enumerate(matches):
-                    result = {key:match.group(pattern.groupindex[key]) for key in pattern.groupindex}
-                    results.append(result)
-            output = self.__split_info(results)
-            del(parts)
+        compression = _compression(self.__filename)
+        if compression is None:
+            return None
+        return OPENERS[compression](self.__filename)
 
-            # Now we have parts pulled out and combined, do further
-            # processing.
-            # cpu_output = self.__split_info(cpu_usage, PART_CPU)
+    def _stream_windows(self, stream):
+        '''
+        Reads decompressed log in windows of about ``STREAM_BUFFER`` bytes,
+        each one cut right before a delimeter at the start of a line, so
+        that sections never cross windows. The rest of a window is carried
+        over to the next one. Windows reaching ``STREAM_WINDOWS`` buffers
+        without a delimeter are cut at their last line instead, so memory
+        stays bounded: records of such huge sections may then be cut too.
+            :return: Generator of ``(window, cut, base)``, sections of the \
+                window are before offset ``cut``, ``base`` is the offset of \
+                the window in the decompressed log
+        '''
 
-        return output
+        delimeter = '\n' + self._module.delimeter()
+        carry = ''
+        base = 0
+
+        while True:
+            with profiler.stage('decompress', trace=False):
+                chunk = stream.read(self.STREAM_BUFFER)
+            window = carry + chunk
+            if not chunk:
+                if window:
+                    yield (window, len(window), base)
+                return
+
+            # A delimeter straddling two reads is found once both are joined
+            cut = window.rfind(delimeter) + 1
+            if cut <= 0 and len(window) >= self.STREAM_WINDOWS * self.STREAM_BUFFER:
+                cut = window.rfind('\n') + 1
+            if cut <= 0:
+                carry = window
+                continue
+            yield (window, cut, base)
+            carry = window[cut:]
+            base += cut
+
+    def _parse_stream_parallel(self, stream):
+        '''
+        Parses windows of a decompressed log in a pool of processes, while
+        the next windows are decompressed. At most two windows per process
+        are in flight, so memory stays bounded.
+            :return: Parsed info, in file order
+        '''
+
+        pool = multiprocessing.Pool(self._jobs)
+        pending = collections.deque()
+        parsed = []
+        try:
+            for window, cut, base in self._stream_windows(stream):
+                pending.append(pool.apply_async(_parse_window, [(self._module, window, cut, base)]))
+                if len(pending) >= 2 * self._jobs:
+                    parsed.append(pending.popleft().get())
+            while pending:
+                parsed.append(pending.popleft().get())
+        finally:
+            pool.close()
+            pool.join()
+
+        self._merge_parts(parsed)
+
+        return Records.concatenate([part_info for part_info, _, _, _ in parsed])
+
+    def _merge_parts(self, parsed):
+        '''
+        Gathers malformed records, skip statistics and offsets of records
+        of parts parsed by worker processes, in order.
+        '''
+        self._malformed = []
+        for _, part_malformed, _, _ in parsed:
+            self._malformed.extend(part_malformed)
+        # Empty logs have no parts at all
+        self._skipped = tuple(sum(counts) for counts in zip(*[skipped for _, _, skipped, _ in parsed])) \
+            or (0, 0)
+        profiler.count('prefilter', chunks=self._skipped[0], bytes=self._skipped[1])
+        offsets = [part_offsets for _, _, _, part_offsets in parsed]
+        if offsets and all(part_offsets is not None for part_offsets in offsets):
+            self._offsets = np.concatenate(offsets)
+
+    def _sample_ranges(self, parmap, count, window_bytes):
+        '''
+        Picks ``count`` windows of about ``window_bytes``, centered in equal
+        slices of the mapped log, each one starting on a delimeter at the
+        start of a line like the ranges of :meth:`_split_ranges`.
+            :return: ``List``-style of ``(start, end)`` offsets, in order
+        '''
+
+        delimeter = '\n' + self._module.delimeter()
+        size = parmap.size()
+        if count * window_bytes >= size:
+            return [(0, size)]
+
+        ranges = []
+        for index in range(count):
+            start = size * (2 * index + 1) // (2 * count) - window_bytes // 2
+            start = max(start, ranges[-1][1] if ranges else 0)
+            if start > 0:
+                dlpos = parmap.find(delimeter, start - 1)
+                if dlpos == -1:
+                    break
+                start = dlpos + 1
+            dlpos = parmap.find(delimeter, start + window_bytes)
+            end = size if dlpos == -1 else dlpos + 1
+            if start < end:
+                ranges.append((start, end))
+            if end == size:
+                break
+
+        # Without any delimeter after the first window, the log is one section
+        return ranges or [(0, size)]
+
+    def _parse_rest(self, parmap):
+        '''
+        Parses the log between the windows of a preview, then puts all the
+        parts back in order.
+            :return: Parsed info of the whole log
+        '''
+
+        gaps = []
+        previous = 0
+        for start, end, _ in self._windows:
+            if start > previous:
+                gaps.append((previous, start))
+            previous = end
+        if previous < parmap.size():
+            gaps.append((previous, parmap.size()))
+
+        if self._jobs > 1 and len(gaps) > 1:
+            with profiler.stage('parse (pool)'):
+                parsed = self._map_ranges(gaps)
+        else:
+            parsed = [self._parse_part(parmap, start, end) for start, end in gaps]
+
+        parts = sorted([(start, part) for (start, _), part in zip(gaps, parsed)] +
+                       [(start, part) for start, _, part in self._windows],
+                       key=lambda part: part[0])
+        parsed = [part for _, part in parts]
+        self._merge_parts(parsed)
+        self._windows = None
+        self._coverage = (parmap.size(), parmap.size())
+
+        return Records.concatenate([part_info for part_info, _, _, _ in parsed])
+
+    def _parse_part(self, parmap, start, end):
+        '''
+        Parses a byte range of the mapped log.
+            :return: ``(info, malformed, skipped, offsets)`` of the range
+        '''
+
+        info = self._parse_file(parmap, self._split_file(parmap, start, end))
+        return (info, self._malformed, self._skipped, self._offsets)
+
+    def _split_ranges(self, parmap, count):
+        '''
+        Splits mapped log file into about ``count`` byte ranges of similar
+        size, each one starting on a delimeter at the start of a line, so
+        that sections never cross ranges.
+            :return: ``List``-style of ``(start, end)`` offsets
+        '''
+
+        delimeter = '\n' + self._module.delimeter()
+        size = parmap.size()
+        bounds = [0]
+
+        for index in range(1, count):
+            dlpos = parmap.find(delimeter, max(size * index // count, bounds[-1]))
+            if dlpos == -1:
+                break
+            # Skip the newline, the delimeter starts the next range
+            if dlpos + 1 > bounds[-1]:
+                bounds.append(dlpos + 1)
+        bounds.append(size)
+
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def _parse_parallel(self, ranges):
+        '''
+        Parses byte ranges of the file in a pool of processes. Each process
+        maps the file itself, so only offsets and parsed records are sent
+        between processes.
+            :param ranges: ``List``-style of ``(start, end)`` offsets
+            :return: Parsed info, in file order
+        '''
+
+        parsed = self._map_ranges(ranges)
+        self._merge_parts(parsed)
+
+        return Records.concatenate([part_info for part_info, _, _, _ in parsed])
+
+    def _map_ranges(self, ranges):
+        '''
+        Parses byte ranges in a pool of processes.
+            :return: ``List``-style of ``(info, malformed, skipped, offsets)``, \
+                in the order of the ranges
+        '''
+
+        tasks = [(self.__filename, self._module, self._index, start, end) for start, end in ranges]
+        pool = multiprocessing.Pool(min(self._jobs, len(tasks)))
+        try:
+            # map() keeps the order of the ranges
+            return pool.map(_parse_range, tasks)
+        finally:
+            pool.close()
+            pool.join()
+
+    def _split_file(self, parmap, start=0, end=None):
+        '''
+        Splits mapped log file into sections on the module delimeter.
+        Sections are not copied, only their (stripped) offsets are
+        yielded, one at a time.
+            :param parmap: Mapped log file
+            :type parmap: mmap.
+            :param start: Offset to start splitting at
+            :param end: Offset to stop splitting at, end of file by default
+            :return: Generator of ``(start, end)`` offsets of file sections
+        '''
+
+        delimeter = self._module.delimeter()
+        # We can do mmap.size() only on read-only mmaps
+        size = parmap.size() if end is None else end
+        oldchunkpos = start
+
+        while oldchunkpos < size:
+            dlpos = parmap.find(delimeter, oldchunkpos, size)
+            # mmap.find() returns -1 on failure, then we want last piece
+            if dlpos == -1:
+                dlpos = size
+
+            start, end = self._strip_range(parmap, oldchunkpos, dlpos)
+            if start < end:
+                yield (start, end)
+
+            # Continue right behind the delimeter we've looked for
+            oldchunkpos = dlpos + len(delimeter)
+
+    def _strip_range(self, parmap, start, end):
+        '''
+        Same as ``str.strip()`` on ``parmap[start:end]``, without the copy.
+            :return: Stripped ``(start, end)`` offsets
+        '''
+        while start < end and parmap[start].isspace():
+            start += 1
+        while end > start and parmap[end - 1].isspace():
+            end -= 1
+        return (start, end)
+
+    def _parse_file(self, parmap, parts):
+        '''
+        Parses splitted file to get proper information from split parts.
+            :param parmap: Mapped log file
+            :param parts: Iterable of ``(start, end)`` offsets of file parts
+            :return: ``Records`` parsed from log file
+        '''
+        return self._parse_windows([(parmap, parts, 0)])
+
+    def _parse_windows(self, windows):
+        '''
+        Parses consecutive windows of the log, e.g. the whole mapped file or
+        decompressed pieces of it.
+            :param windows: Iterable of ``(data, parts, base)``, ``parts`` \
+                are ``(start, end)`` offsets in ``data``, ``base`` is the \
+                offset of ``data`` in the log
+            :return: ``Records`` parsed from log file
+        '''
+        matcher = self._module.matcher()
+
+        if matcher is None:
+            return False
+
+        anchors = self._module.anchors()
+        skipped_chunks = skipped_bytes = 0
+        batches = []
+        results = []
+        # Section of each record, for the index
+        offsets = [] if self._index is not None else None
+        with profiler.stage('parse'):
+            for data, parts, base in windows:
+                known = len(matcher.malformed)
+                for start, end in profiler.timed_iter('split', parts):
+                    profiler.count('split', bytes=end - start, chunks=1)
+                    # Sections lacking an anchor hold no record, not even a
+                    # malformed one, a find() in place is enough to skip them
+                    if anchors and not all(data.find(anchor, start, end) != -1
+                                           for anchor in anchors):
+                        skipped_chunks += 1
+                        skipped_bytes += end - start
+                        continue
+                    # Matcher scans the data in place between the offsets
+                    section = (base + start, base + end)
+                    for fields in matcher.finditer(data, start, end):
+                        results.append(fields)
+                        if offsets is not None:
+                            offsets.append(section)
+                        # Raw records are only kept until a batch is
+                        # converted, even partway through a section
+                        if len(results) >= self.BATCH_RECORDS:
+                            batches.append(self.__split_info(results))
+                            results = []
+                if base:
+                    matcher.malformed[known:] = [(offset + base, reason) for offset, reason
+                                                 in matcher.malformed[known:]]
+            batches.append(self.__split_info(results))
+        self._malformed = matcher.malformed
+        self._skipped = (skipped_chunks, skipped_bytes)
+        if offsets is not None:
+            self._offsets = np.array(offsets, dtype=np.int64).reshape(-1, 2)
+        profiler.count('prefilter', chunks=skipped_chunks, bytes=skipped_bytes)
+
+        info = Records.concatenate(batches)
+        profiler.count('parse', records=len(info))
+        return info
 
     def __find_column(self, column_names, part_first_line):
         '''
@@ -219,9 +711,93 @@ class Parser(object):
         '''
         Maps parts into logical stuff
         :param parts: Parts to map into usable data
-        :return: ``List``-style info from files, now finally \
+        :return: ``Records`` from files, now finally \
             completely parsed into meaningful data for further processing
         '''
         # Common assigner
 
-        return self._module.split_info(parts)
+        with profiler.stage('split_info'):
+            info = self._module.split_info(parts)
+        profiler.count('split_info', records=len(parts))
+        return info
+
+
+def _parse_range(task):
+    '''
+    Parses a byte range of a log file, in a worker process of
+    :meth:`Parser._parse_parallel`.
+        :param task: ``(filename, module, index, start, end)``
+        :return: ``(info, malformed, skipped, offsets)`` of the range
+    '''
+    filename, module, index, start, end = task
+    parser = Parser(filename, module, index=index)
+    parmap = parser._open_file()
+    try:
+        return parser._parse_part(parmap, start, end)
+    finally:
+        parmap.close()
+
+
+def _parse_window(task):
+    '''
+    Parses a window of a decompressed log, in a worker process of
+    :meth:`Parser._parse_stream_parallel`.
+        :param task: ``(module, window, cut, base)``
+        :return: ``(info, malformed, skipped, offsets)`` of the window
+    '''
+    module, window, cut, base = task
+    parser = Parser('', module)
+    info = parser._parse_windows([(window, parser._split_file(window, 0, cut), base)])
+    return (info, parser.get_malformed(), parser.get_skipped(), None)
+
+
+def _compression(filename):
+    '''
+    Recognizes compressed files by their first bytes, whatever their name.
+        :return: Key of ``OPENERS``, ``None`` for uncompressed files
+    '''
+    with open(filename, 'rb') as fhandle:
+        magic = fhandle.read(6)
+    for compression, prefix in MAGIC:
+        if magic.startswith(prefix):
+            return compression
+    return None
+
+
+def _open_xz(filename):
+    try:
+        import lzma
+    except ImportError:
+        try:
+            from backports import lzma
+        except ImportError:
+            raise Exception("Reading {} needs the lzma module (backports.lzma on Python 2)"
+                            .format(filename))
+    return lzma.open(filename, 'rb')
+
+
+def _open_zstd(filename):
+    try:
+        import zstandard
+    except ImportError:
+        raise Exception("Reading {} needs the zstandard package".format(filename))
+    fhandle = open(filename, 'rb')
+    # Closing the reader closes the file
+    return zstandard.ZstdDecompressor().stream_reader(fhandle)
+
+
+"""First bytes of compressed files"""
+MAGIC = [
+    ('gz', b'\x1f\x8b'),
+    ('bz2', b'BZh'),
+    ('xz', b'\xfd7zXZ\x00'),
+    ('zst', b'\x28\xb5\x2f\xfd'),
+]
+
+"""Compression => function opening a compressed file for reading"""
+OPENERS = {
+    'gz': lambda filename: gzip.open(filename, 'rb'),
+    'bz2': lambda filename: bz2.BZ2File(filename, 'rb'),
+    'xz': _open_xz,
+    'zst': _open_zstd,
+}
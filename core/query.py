@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+'''
+:mod:`core.query` is a module containing filters on parsed records, e.g.
+``method=decode,chunk_size>=64KB,threads<=32``.
+'''
+
+import operator
+import re
+
+import numpy as np
+
+from util import SizeUtils
+
+"""Operator of a predicate => function comparing a column to a value"""
+OPERATORS = {
+    '=': operator.eq,
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+PREDICATE_PATTERN = re.compile(r"^\s*(?P<field>\w+)\s*(?P<operator>==|!=|<=|>=|=|<|>)\s*(?P<value>.*?)\s*$")
+
+
+class Predicate(object):
+    '''
+    Comparison of a field of records to a value.
+        :param field: Field name
+        :type field: str.
+        :param operator: One of ``OPERATORS``
+        :type operator: str.
+        :param value: Value converted to the type of the field
+    '''
+
+    def __init__(self, field, operator, value):
+        self.field = field
+        self.operator = operator
+        self.value = value
+
+    def mask(self, records):
+        '''
+        Tells which records hold.
+            :param records: ``Records``, or anything with ``decode()``
+            :return: Boolean ``numpy.ndarray``
+        '''
+        return OPERATORS[self.operator](records.decode(self.field), self.value)
+
+    def __repr__(self):
+        return "{}{}{}".format(self.field, self.operator, self.value)
+
+
+def parse_filters(expressions, schema):
+    '''
+    Reads predicates, separated by commas, e.g. given once per ``--filter``.
+    A field may be named by a prefix of its name, as long as only one
+    field starts with it, e.g. ``threads`` for ``threads_num``.
+        :param expressions: ``List``-style of ``str``
+        :param schema: Field name => type, see ``schema()`` of modules
+        :return: ``List``-style of ``Predicate``
+    '''
+    predicates = []
+    for expression in expressions or []:
+        for text in expression.split(','):
+            if not text.strip():
+                continue
+            match = PREDICATE_PATTERN.match(text)
+            if match is None:
+                raise Exception("Cannot read filter {!r}, expected e.g. chunk_size>=64KB".format(text))
+            field = _field(match.group('field'), schema)
+            predicates.append(Predicate(field, match.group('operator'),
+                                        _convert(match.group('value'), schema[field], text)))
+    return predicates
+
+
+def select(records, predicates):
+    '''
+    Tells which records hold every predicate.
+        :return: Boolean ``numpy.ndarray``
+    '''
+    mask = np.ones(len(records), dtype=bool)
+    for predicate in predicates:
+        mask &= predicate.mask(records)
+    return mask
+
+
+def _field(name, schema):
+    if name in schema:
+        return name
+    fields = [field for field in schema if field.startswith(name)]
+    if len(fields) != 1:
+        raise Exception("Cannot filter on {}, fields are {}".format(name, ", ".join(sorted(schema))))
+    return fields[0]
+
+
+def _convert(value, kind, text):
+    try:
+        if kind == 'size':
+            converted = SizeUtils.convert_size(value)
+            if converted is None:
+                raise ValueError(value)
+            return converted
+        if kind == 'int':
+            return int(value)
+        if kind == 'float':
+            return float(value)
+    except ValueError:
+        raise Exception("Cannot read value of filter {!r} as {}".format(text, kind))
+    return value
@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+'''
+:mod:`core.records` is a module containing the columnar store of parsed
+records.
+'''
+
+import numpy as np
+
+from util import NumberUtils
+from util import SizeUtils
+
+"""Field type => function converting a list of strings into an array"""
+CONVERTERS = {
+    'size': SizeUtils.convert_sizes,
+    'int': NumberUtils.as_ints,
+    'float': NumberUtils.as_floats,
+}
+
+
+class Records(object):
+    '''
+    Parsed records stored column by column, one typed NumPy array per field.
+    String fields are categorical: the column holds integer codes into
+    the list of distinct values of the field.
+        :param columns: Field name => ``numpy.ndarray``
+        :type columns: dict.
+        :param categories: Field name => ``list`` of values, for string fields
+        :type categories: dict.
+    '''
+
+    CODE_DTYPE = np.int32
+
+    def __init__(self, columns=None, categories=None):
+        self.columns = columns or {}
+        self.categories = categories or {}
+
+    @classmethod
+    def from_lists(cls, lists):
+        '''
+        Builds records from one list of converted values per field. Column
+        types are inferred by NumPy, strings become categorical.
+            :param lists: Field name => ``list`` of values
+            :return: ``Records``
+        '''
+        columns = {}
+        categories = {}
+        for name, values in lists.items():
+            column = np.asarray(values)
+            if column.dtype.kind in ('S', 'U', 'O'):
+                labels, codes = np.unique(column, return_inverse=True)
+                categories[name] = labels.tolist()
+                column = codes.astype(cls.CODE_DTYPE)
+            columns[name] = column
+        return cls(columns, categories)
+
+    @classmethod
+    def from_strings(cls, lists, schema):
+        '''
+        Builds records from one list of matched strings per field, each
+        field converted at once according to its type.
+            :param lists: Field name => ``list`` of strings
+            :param schema: Field name => ``'size'``, ``'int'``, ``'float'`` \
+                or ``'string'`` (categorical)
+            :return: ``Records``
+        '''
+        columns = {}
+        categories = {}
+        for name, values in lists.items():
+            if schema[name] == 'string':
+                labels, codes = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+                categories[name] = labels.tolist()
+                columns[name] = codes.astype(cls.CODE_DTYPE)
+            else:
+                columns[name] = CONVERTERS[schema[name]](values)
+        return cls(columns, categories)
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        '''
+        Rebuilds records from the output of :meth:`to_arrays`.
+            :param arrays: Name => ``numpy.ndarray``, e.g. a loaded ``.npz``
+            :return: ``Records``
+        '''
+        columns = {}
+        categories = {}
+        for key in arrays:
+            kind, _, name = key.partition(':')
+            if kind == 'column':
+                columns[name] = arrays[key]
+            elif kind == 'labels':
+                categories[name] = arrays[key].tolist()
+        return cls(columns, categories)
+
+    @classmethod
+    def concatenate(cls, parts):
+        '''
+        Concatenates records in order, merging categories.
+            :param parts: ``List``-style of ``Records``
+            :return: ``Records``
+        '''
+        # Empty parts carry no type information
+        parts = [part for part in parts if len(part)] or parts[:1]
+        if not parts:
+            return cls()
+        if len(parts) == 1:
+            return parts[0]
+
+        columns = {}
+        categories = {}
+        for name in parts[0].columns:
+            if name not in parts[0].categories:
+                columns[name] = np.concatenate([part.columns[name] for part in parts])
+                continue
+            labels = sorted(set(label for part in parts for label in part.categories[name]))
+            index = dict((label, code) for code, label in enumerate(labels))
+            columns[name] = np.concatenate([
+                np.array([index[label] for label in part.categories[name]],
+                         dtype=cls.CODE_DTYPE)[part.columns[name]]
+                for part in parts])
+            categories[name] = labels
+        return cls(columns, categories)
+
+    def __len__(self):
+        for column in self.columns.values():
+            return len(column)
+        return 0
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def fields(self):
+        return list(self.columns)
+
+    def labels(self, name):
+        '''
+        Returns the distinct values of a string field, indexed by code.
+        '''
+        return self.categories[name]
+
+    def decode(self, name):
+        '''
+        Returns the values of a field, with codes of string fields replaced
+        by the strings themselves.
+            :return: ``numpy.ndarray``
+        '''
+        column = self.columns[name]
+        if name not in self.categories:
+            return column
+        return np.asarray(self.categories[name])[column]
+
+    def to_arrays(self):
+        '''
+        Flattens records into plain arrays, e.g. for ``numpy.savez``.
+            :return: Name => ``numpy.ndarray``
+        '''
+        arrays = dict(('column:' + name, column) for name, column in self.columns.items())
+        for name, labels in self.categories.items():
+            arrays['labels:' + name] = np.array(labels)
+        return arrays
+
+    def to_dict(self):
+        '''
+        Converts records into plain lists, e.g. for JSON.
+            :return: Field name => ``list`` of values, strings decoded
+        '''
+        return dict((name, self.decode(name).tolist()) for name in self.columns)
+
+    def take(self, index):
+        '''
+        Selects records.
+            :param index: Boolean mask or integer positions
+            :return: ``Records`` sharing categories with these ones
+        '''
+        return Records(dict((name, column[index]) for name, column in self.columns.items()),
+                       self.categories)
+
+
+class Aggregate(object):
+    '''
+    Statistics of a value over groups of records sharing the same keys,
+    one entry per group in every array.
+        :param keys: Key name => ``numpy.ndarray`` of the key of each group
+        :type keys: dict.
+    '''
+
+    def __init__(self, keys, count, mean, minimum, maximum, std, percentiles):
+        self.keys = keys
+        self.count = count
+        self.mean = mean
+        self.min = minimum
+        self.max = maximum
+        self.std = std
+        self.percentiles = percentiles
+        """(:obj:`dict`): percentile => ``numpy.ndarray``"""
+
+    @classmethod
+    def from_values(cls, keys, values, percentiles=(50, 90)):
+        '''
+        Groups values by keys with a single sort, then computes every
+        statistic of every group at once.
+            :param keys: Key name => ``numpy.ndarray``, one entry per record
+            :type keys: dict.
+            :param values: ``numpy.ndarray`` of values, one per record
+            :param percentiles: Percentiles to compute, from 0 to 100
+            :return: ``Aggregate``
+        '''
+        names = sorted(keys)
+        values = np.asarray(values, dtype=np.float64)
+        if not len(values):
+            empty = np.zeros(0)
+            return cls(dict((name, np.asarray(keys[name])[:0]) for name in names),
+                       np.zeros(0, dtype=np.int64), empty, empty, empty, empty,
+                       dict((q, empty) for q in percentiles))
+
+        # Sorted by keys (in order of their names), then by value within each group
+        order = np.lexsort([values] + [keys[name] for name in reversed(names)])
+        values = values[order]
+        sorted_keys = [np.asarray(keys[name])[order] for name in names]
+
+        starts, group = _groups(sorted_keys)
+
+        count = np.bincount(group)
+        mean = np.bincount(group, weights=values) / count
+        std = np.sqrt(np.bincount(group, weights=(values - mean[group]) ** 2) / count)
+
+        # Values are sorted within groups, percentiles interpolate linearly
+        # between closest ranks like numpy.percentile
+        stats = {}
+        for q in percentiles:
+            rank = starts + (count - 1) * (q / 100.0)
+            low = np.floor(rank).astype(np.int64)
+            high = np.ceil(rank).astype(np.int64)
+            stats[q] = values[low] + (values[high] - values[low]) * (rank - low)
+
+        return cls(dict((name, column[starts]) for name, column in zip(names, sorted_keys)),
+                   count, mean, values[starts], values[starts + count - 1], std, stats)
+
+    def merge(self, other):
+        '''
+        Combines statistics with the ones of other records, e.g. records
+        parsed later, in time proportional to the number of groups.
+        Percentiles cannot be combined and are dropped.
+            :param other: ``Aggregate`` over the same keys
+            :return: ``Aggregate``
+        '''
+        names = sorted(self.keys)
+        keys = [np.concatenate([self.keys[name], other.keys[name]]) for name in names]
+        if not len(keys[0]):
+            return self
+
+        order = np.lexsort(keys[::-1])
+        keys = [column[order] for column in keys]
+        starts, group = _groups(keys)
+
+        count = np.concatenate([self.count, other.count])[order]
+        mean = np.concatenate([self.mean, other.mean])[order]
+        std = np.concatenate([self.std, other.std])[order]
+
+        total = np.bincount(group, weights=count)
+        merged_mean = np.bincount(group, weights=count * mean) / total
+        # Sum of squared deviations of each part, moved to the merged mean
+        squares = count * (std ** 2 + (mean - merged_mean[group]) ** 2)
+        merged_std = np.sqrt(np.bincount(group, weights=squares) / total)
+
+        return Aggregate(dict((name, column[starts]) for name, column in zip(names, keys)),
+                         total.astype(np.int64), merged_mean,
+                         np.minimum.reduceat(np.concatenate([self.min, other.min])[order], starts),
+                         np.maximum.reduceat(np.concatenate([self.max, other.max])[order], starts),
+                         merged_std, {})
+
+    def __len__(self):
+        return len(self.count)
+
+
+def _groups(sorted_keys):
+    '''
+    Finds groups of equal keys in sorted key columns.
+        :return: ``(starts, group)``, first position of each group and \
+            group of each position
+    '''
+    new_group = np.zeros(len(sorted_keys[0]), dtype=bool)
+    new_group[0] = True
+    for column in sorted_keys:
+        new_group[1:] |= column[1:] != column[:-1]
+    return (np.flatnonzero(new_group), np.cumsum(new_group) - 1)
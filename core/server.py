@@ -0,0 +1,342 @@
+#!/usr/bin/env python
+'''
+:mod:`core.server` is a module containing the HTTP service of logviz, which
+keeps parsed logs in memory between requests.
+'''
+
+import copy
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import traceback
+from collections import OrderedDict, deque
+
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import parse_qs, urlparse
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from core import export
+from core import parser
+from core import viz
+from module import ModuleController as mc
+from module import UnknownModuleError
+
+"""Output format => (output type, content type)"""
+FORMATS = {
+    'pdf': (viz.Visualization.PDF_OUTPUT, 'application/pdf'),
+    'png': (viz.Visualization.PNG_OUTPUT, 'image/png'),
+    'html': (viz.Visualization.HTML_OUTPUT, 'text/html; charset=utf-8'),
+    'json': (viz.Visualization.JSON_OUTPUT, 'application/json'),
+}
+
+
+class BadRequest(Exception):
+    '''
+    Raised for requests which can't be served whatever the state of the
+    service, e.g. for unknown formats or logs without records.
+    '''
+
+
+class LRUCache(object):
+    '''
+    Thread safe cache of the most recently used entries. Entries missing
+    from the cache are loaded once, even if asked for by several threads.
+        :param max_entries: Number of entries kept
+        :type max_entries: int.
+    '''
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading = {}
+
+    def get(self, key, load):
+        '''
+        Returns an entry, loaded by ``load()`` if missing.
+        '''
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                value = self._entries.pop(key)
+                self._entries[key] = value
+                return value
+            self.misses += 1
+            lock = self._loading.setdefault(key, threading.Lock())
+
+        with lock:
+            with self._lock:
+                if key in self._entries:
+                    return self._entries[key]
+            try:
+                value = load()
+                with self._lock:
+                    self._entries[key] = value
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+            finally:
+                with self._lock:
+                    self._loading.pop(key, None)
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'max_entries': self.max_entries,
+                    'hits': self.hits, 'misses': self.misses}
+
+
+class Metrics(object):
+    '''
+    Counts requests and keeps the latency of the last ones, per endpoint.
+    '''
+
+    LATENCIES = 1000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests = {}
+        self._errors = {}
+        self._latencies = {}
+
+    def add(self, endpoint, seconds, error=False):
+        with self._lock:
+            self._requests[endpoint] = self._requests.get(endpoint, 0) + 1
+            if error:
+                self._errors[endpoint] = self._errors.get(endpoint, 0) + 1
+            self._latencies.setdefault(endpoint, deque(maxlen=self.LATENCIES)).append(seconds)
+
+    def stats(self):
+        with self._lock:
+            stats = {}
+            for endpoint, latencies in self._latencies.items():
+                latencies = np.array(latencies) * 1000
+                stats[endpoint] = {
+                    'requests': self._requests[endpoint],
+                    'errors': self._errors.get(endpoint, 0),
+                    'latency ms': {'p50': np.percentile(latencies, 50),
+                                   'p90': np.percentile(latencies, 90),
+                                   'p99': np.percentile(latencies, 99),
+                                   'max': latencies.max()},
+                }
+            return stats
+
+
+class Service(object):
+    '''
+    Parses, aggregates and renders logs on request. Parsed logs and their
+    aggregated results are kept in memory, keyed on the identity of the
+    log (path, size, mtime) so that changed logs are parsed again. Figures
+    are painted in a pool of processes, JSON and HTML in the service.
+        :param root: Directory of the logs, requests can't read outside of it
+        :type root: str.
+        :param jobs: Number of processes painting figures, ``0`` for one \\
+            per CPU core
+        :type jobs: int.
+        :param max_entries: Number of parsed logs, and of aggregated \\
+            results, kept in memory
+        :type max_entries: int.
+        :param cache: Cache of parsed files, none by default
+        :type cache: core.cache.ParseCache.
+    '''
+
+    def __init__(self, root='.', jobs=1, max_entries=16, cache=None):
+        self.root = os.path.realpath(root)
+        self.cache = cache
+        self.controller = mc()
+        self.records = LRUCache(max_entries)
+        self.results = LRUCache(max_entries)
+        self.metrics = Metrics()
+        self.pool = multiprocessing.Pool(jobs or multiprocessing.cpu_count())
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+    def render(self, in_log, log_type, sub_type, output_format='png', plot=0,
+               max_grid=64, interpolate=False, renderer=None):
+        '''
+        Renders a log.
+            :param in_log: Log file, relative to the root
+            :param plot: Plot drawn as PNG, see ``num_plots()`` of the module
+            :param renderer: One of ``core.viz.RENDERERS``, the one of the \
+                module by default
+            :return: ``(content type, bytes)``
+        '''
+        if output_format not in FORMATS:
+            raise BadRequest("{} is not one of {}".format(output_format, sorted(FORMATS)))
+        if renderer is not None and renderer not in viz.RENDERERS:
+            raise BadRequest("{} is not one of {}".format(renderer, viz.RENDERERS))
+        output_type, content_type = FORMATS[output_format]
+
+        module = self.results.get(self._identity(in_log, log_type, sub_type),
+                                  lambda: self._aggregate(in_log, log_type, sub_type))
+        if interpolate or renderer is not None:
+            # Cached modules are shared between requests
+            module = copy.copy(module)
+            module.interpolate = interpolate
+            module.renderer = renderer or module.renderer
+
+        if output_type == viz.Visualization.JSON_OUTPUT:
+            return (content_type, json.dumps(module.export_data(max_grid),
+                                             separators=(',', ':'), sort_keys=True))
+        if output_type == viz.Visualization.HTML_OUTPUT:
+            return (content_type, export.html(module.export_data(max_grid)))
+
+        if not 0 <= plot < module.num_plots():
+            raise BadRequest("plot {} is not between 0 and {}".format(plot, module.num_plots() - 1))
+        return (content_type, self.pool.apply(_render, [(module, output_type, plot)]))
+
+    def _aggregate(self, in_log, log_type, sub_type):
+        # Records are the same for every sub type
+        info = self.records.get(self._identity(in_log, log_type),
+                                lambda: self._parse(in_log, log_type, sub_type))
+        # Modules keep the results of the log they aggregated, one copy per log
+        module = copy.copy(self.controller.get_module(log_type, sub_type))
+        viz.Visualization(info, module)
+        module.generate_ticks()
+        return module
+
+    def _parse(self, in_log, log_type, sub_type):
+        module = self.controller.get_module(log_type, sub_type)
+        info = parser.Parser(self._path(in_log), module, cache=self.cache).get_info()
+        if info is False:
+            raise BadRequest("Couldn't parse file {}".format(in_log))
+        if not len(info):
+            raise BadRequest("No records in {}".format(in_log))
+        return info
+
+    def _identity(self, in_log, *keys):
+        stat = os.stat(self._path(in_log))
+        return (self._path(in_log), stat.st_size, stat.st_mtime) + keys
+
+    def _path(self, in_log):
+        path = os.path.realpath(os.path.join(self.root, in_log))
+        if os.path.commonprefix([path, self.root + os.sep]) != self.root + os.sep:
+            raise BadRequest("{} is outside of {}".format(in_log, self.root))
+        if not os.path.isfile(path):
+            raise BadRequest("Cannot find log file {}".format(in_log))
+        return path
+
+    def stats(self):
+        return {'records': self.records.stats(), 'results': self.results.stats(),
+                'endpoints': self.metrics.stats()}
+
+
+class Handler(BaseHTTPRequestHandler):
+    '''
+    Endpoints of the service:
+
+    - ``GET /render?log=<path>&type=ECB&sub_type=Throughput&format=png&plot=0``
+      (also ``renderer``, ``interpolate``, and ``max_grid`` for JSON and HTML)
+    - ``GET /metrics``, hits and misses of the caches and latencies
+    '''
+
+    service = None
+
+    def do_GET(self):
+        begin = time.time()
+        url = urlparse(self.path)
+        query = dict((name, values[-1]) for name, values in parse_qs(url.query).items())
+        error = False
+        try:
+            if url.path == '/render':
+                content_type, body = self.service.render(
+                    _required(query, 'log'), query.get('type', 'ECB'), _required(query, 'sub_type'),
+                    output_format=query.get('format', 'png'), plot=_integer(query, 'plot', 0),
+                    max_grid=_integer(query, 'max_grid', 64),
+                    interpolate=query.get('interpolate', '') in ('1', 'true'),
+                    renderer=query.get('renderer'))
+                self._reply(200, content_type, body)
+            elif url.path == '/metrics':
+                self._reply(200, 'application/json', json.dumps(self.service.stats(), indent=2))
+            else:
+                self._reply(404, 'text/plain', 'Not found\n')
+        except (BadRequest, UnknownModuleError) as exception:
+            error = True
+            self._reply(400, 'text/plain', 'Bad request: {}\n'.format(exception))
+        except Exception:
+            error = True
+            self._reply(500, 'text/plain', traceback.format_exc())
+        self.service.metrics.add(url.path, time.time() - begin, error)
+
+    def _reply(self, status, content_type, body):
+        if not isinstance(body, bytes):
+            body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def serve(service, host='127.0.0.1', port=8080):
+    '''
+    Serves requests until interrupted.
+    '''
+    class ServiceHandler(Handler):
+        pass
+    ServiceHandler.service = service
+
+    server = ThreadingHTTPServer((host, port), ServiceHandler)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+def _required(query, name):
+    if name not in query:
+        raise BadRequest("{} is missing".format(name))
+    return query[name]
+
+
+def _integer(query, name, default):
+    try:
+        return int(query.get(name, default))
+    except ValueError:
+        raise BadRequest("{} is not a number".format(name))
+
+
+def _render(task):
+    '''
+    Paints a figure in a worker process of :class:`Service`.
+        :param task: ``(module, output_type, plot)``, PDF holds every plot
+        :return: Content of the figure
+    '''
+    module, output_type, plot = task
+    viz.pyplot().switch_backend('Agg')
+    temp_dir = tempfile.mkdtemp(prefix='logviz-')
+    try:
+        if output_type == viz.Visualization.PDF_OUTPUT:
+            output_path = os.path.join(temp_dir, 'figure.pdf')
+            plots = range(module.num_plots())
+        else:
+            output_path = os.path.join(temp_dir, 'figure.png')
+            plots = [plot]
+        viz._paint_plots((module, plots, output_type, output_path, None))
+        if output_type == viz.Visualization.PNG_OUTPUT:
+            output_path = viz.plot_path(output_path, module, plot, module.num_plots())
+        with open(output_path, 'rb') as fhandle:
+            return fhandle.read()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
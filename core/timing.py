@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+'''
+:mod:`core.timing` is a module containing the per stage profiler of logviz.
+'''
+
+import json
+import os
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+class Profiler(object):
+    '''
+    Measures wall time, CPU time and peak RSS of each processing stage,
+    along with counters such as bytes read. Nested stages are not counted
+    in their parents. Disabled profilers cost next to nothing.
+    '''
+
+    def __init__(self):
+        self.enabled = False
+        self.stages = OrderedDict()
+        self.events = []
+        """(:obj:`list` of :obj:`dict`): Chrome trace events"""
+        self._stack = []
+        self._origin = time.time()
+
+    def enable(self):
+        self.enabled = True
+        self._origin = time.time()
+
+    @contextmanager
+    def stage(self, name, trace=True):
+        '''
+        Measures the enclosed code as part of a stage.
+            :param trace: Record a Chrome trace event for this call
+        '''
+        if not self.enabled:
+            yield
+            return
+
+        self._stack.append([0.0, 0.0])
+        wall, cpu = time.time(), _cpu_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.time() - wall, _cpu_time() - cpu
+            child_wall, child_cpu = self._stack.pop()
+            if self._stack:
+                self._stack[-1][0] += wall
+                self._stack[-1][1] += cpu
+
+            stats = self._stats(name)
+            stats['calls'] += 1
+            stats['wall'] += wall - child_wall
+            stats['cpu'] += cpu - child_cpu
+            stats['rss'] = max(stats['rss'], _peak_rss())
+            if trace:
+                self.events.append({
+                    'name': name, 'ph': 'X', 'pid': os.getpid(), 'tid': 0,
+                    'ts': int((time.time() - wall - self._origin) * 1e6),
+                    'dur': int(wall * 1e6)})
+
+    def timed_iter(self, name, iterable):
+        '''
+        Measures the time spent producing items of an iterable, e.g. a
+        generator consumed by another stage.
+        '''
+        if not self.enabled:
+            return iterable
+        return self._timed_iter(name, iterable)
+
+    def _timed_iter(self, name, iterable):
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name, trace=False):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def count(self, name, **counters):
+        '''
+        Adds to counters of a stage, e.g. ``bytes``, ``chunks`` or ``records``.
+        '''
+        if not self.enabled:
+            return
+        stats = self._stats(name)
+        for counter, value in counters.items():
+            stats[counter] = stats.get(counter, 0) + value
+
+    def report(self):
+        '''
+        Formats stages as a table, in order of first use.
+            :return: ``str``
+        '''
+        lines = ["{:<16} {:>6} {:>9} {:>9} {:>9} {:>12} {:>8} {:>12}".format(
+            'stage', 'calls', 'wall s', 'cpu s', 'rss MB', 'bytes', 'chunks', 'records/s')]
+        for name, stats in self.stages.items():
+            rate = ''
+            if stats.get('records') and stats['wall']:
+                rate = '{:.0f}'.format(stats['records'] / stats['wall'])
+            lines.append("{:<16} {:>6} {:>9.3f} {:>9.3f} {:>9.1f} {:>12} {:>8} {:>12}".format(
+                name, stats['calls'], stats['wall'], stats['cpu'], stats['rss'] / 1024.0,
+                stats.get('bytes', ''), stats.get('chunks', ''), rate))
+        lines.append("{:<16} {:>6} {:>9.3f} {:>9.3f}".format(
+            'total', '', sum(stats['wall'] for stats in self.stages.values()),
+            sum(stats['cpu'] for stats in self.stages.values())))
+        return "\n".join(lines)
+
+    def write_trace(self, path):
+        '''
+        Writes stages in Chrome trace format, for chrome://tracing.
+        '''
+        with open(path, 'w') as fhandle:
+            json.dump({'traceEvents': self.events}, fhandle)
+
+    def _stats(self, name):
+        if name not in self.stages:
+            self.stages[name] = {'calls': 0, 'wall': 0.0, 'cpu': 0.0, 'rss': 0}
+        return self.stages[name]
+
+
+def _cpu_time():
+    times = os.times()
+    return times[0] + times[1]
+
+
+def _peak_rss():
+    '''
+    Returns peak resident set size of the process so far, in KB.
+    '''
+    if resource is None:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+"""Profiler of this process, enabled by ``logviz.py --profile``"""
+profiler = Profiler()
@@ -3,30 +3,71 @@
 :mod:`core.viz` is a module containing classes for visualizing logs.
 '''
 
-from matplotlib.backends.backend_pdf import PdfPages
-from mpl_toolkits.mplot3d import axes3d
-from matplotlib import cm
-from scipy.interpolate import griddata
-import matplotlib.patches as mpatches
-import matplotlib.pyplot as plt
-import math
+import copy
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
 
 import numpy as np
 
+from core import export
+from core.records import Records
+from core.timing import profiler
+
+"""Ways of painting the grids of a sweep, see ``renderer`` of modules"""
+RENDERERS = ['surface', 'heatmap']
+
+
+def pick_renderer(renderers, sub_type, default):
+    """Picks the renderer of a sub type.
+
+    Args:
+        renderers (:obj:`dict`): Sub type => renderer, key ``None`` for
+            every sub type, or ``None``
+        sub_type (:str:): Sub type of the module
+        default (:str:): Renderer of the module for the sub type
+
+    Returns:
+        str: One of ``RENDERERS``
+    """
+    renderers = renderers or {}
+    return renderers.get(sub_type, renderers.get(None, default))
+
+
+def pyplot():
+    """Imports pyplot on first use, so that only drawing pays for it.
+
+    The non-interactive Agg backend is selected before, unless another
+    backend was chosen with ``MPLBACKEND`` or backends are already loaded.
+
+    Returns:
+        module: ``matplotlib.pyplot``
+    """
+    if 'matplotlib.backends' not in sys.modules and 'MPLBACKEND' not in os.environ:
+        import matplotlib
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
 class Visualization(object):
     PDF_OUTPUT = 0
     PNG_OUTPUT = 1
+    HTML_OUTPUT = 2
+    JSON_OUTPUT = 3
     PLT_XTICK_LABEL_ROTATION = 'horizontal'
 
     def __init__(self, data, module=None):
         """Create a log visualization.
 
         Args:
-            data (:list:): Processed log from Parser
+            data (:obj:`Records`): Processed log from Parser
             log_type (:str:): Log type
         """
 
-        if not isinstance(data, list):
+        if not isinstance(data, Records):
             raise Exception('Incompatible data type: {}'.format(
                 type(data).__name__))
         if module is None:
@@ -54,32 +95,309 @@ class Visualization(object):
         """(:obj:`list` of :obj:`str`) y axis tick labels, if the figure is 3-D"""
 
         self.results = {}
-        self.fig_height = 0
         self.num_plots = 0
 
-        self._calculate_plot_height()
         self._preprocess_data()
 
-    def _calculate_plot_height(self):
-        num_plots = self.module.num_plots()
+    def _preprocess_data(self):
+        with profiler.stage('xy_data'):
+            self.module.xy_data(self.data)
+        with profiler.stage('preprocess_data'):
+            self.module.preprocess_data(self.data)
+        profiler.count('preprocess_data', records=len(self.data))
 
-        self.num_plots = num_plots
-        self.fig_height = num_plots * 4
+    def update(self, data):
+        """Adds records parsed after the visualization was created.
 
-    def _preprocess_data(self):
-        self.module.xy_data(self.data)
-        self.module.preprocess_data(self.data)
+        Args:
+            data (:obj:`Records`): Newly parsed records
+        """
+        with profiler.stage('update_data'):
+            self.module.update_data(data)
+        profiler.count('update_data', records=len(data))
+
+    def save(self, output_path, output_type=PDF_OUTPUT, jobs=1, note=None):
+        """Draws every plot of the module, in one pass.
+
+        Plots are pages of a single PDF. As PNG, each plot is a file of its
+        own named after the plot, unless there is only one.
+
+        Args:
+            output_path (:str:): Output file
+            output_type (:int:): ``PDF_OUTPUT`` or ``PNG_OUTPUT``
+            jobs (:int:): Number of processes painting the plots, ``0`` for
+                one per CPU core. Pages of a PDF painted apart are merged
+                with PyPDF2, they are painted in this process without it.
+            note (:str:): Written in a corner of every plot, e.g. the
+                coverage of a preview
+        """
+        with profiler.stage('import'):
+            pyplot()
+
+        self.num_plots = self.module.num_plots()
+        with profiler.stage('generate_ticks'):
+            self.module.generate_ticks()
 
-    def save(self, output_path, output_type=PDF_OUTPUT):
-        fig = plt.figure()
-        self.module.generate_ticks()
-        self.module.paint(fig)
+        jobs = min(jobs or multiprocessing.cpu_count(), self.num_plots)
+        if jobs > 1 and output_type == Visualization.PDF_OUTPUT and _pdf_merger() is None:
+            sys.stderr.write('Warning: PyPDF2 is needed to paint pages of a PDF in parallel, '
+                             'painting them one after another\n')
+            jobs = 1
+        if jobs <= 1:
+            _paint_plots((self.module, range(self.num_plots), output_type, output_path, note))
+            return
 
-        # fig.tight_layout()
+        with profiler.stage('paint (pool)'):
+            self._save_parallel(output_path, output_type, jobs, note)
+
+    def export(self, output_path, output_type=JSON_OUTPUT, max_grid=64, note=None):
+        """Writes the aggregated results without drawing them.
+
+        Args:
+            output_path (:str:): Output file
+            output_type (:int:): ``JSON_OUTPUT``, or ``HTML_OUTPUT`` for the
+                results along with a viewer
+            max_grid (:int:): Largest number of rows and columns of each
+                grid, larger ones are averaged down
+            note (:str:): Shown along with the title, e.g. the coverage of
+                a preview
+        """
+        with profiler.stage('export_data'):
+            data = self.module.export_data(max_grid)
+        if note:
+            data['note'] = note
+        with profiler.stage('save'):
+            if output_type == Visualization.HTML_OUTPUT:
+                export.write_html(data, output_path)
+            elif output_type == Visualization.JSON_OUTPUT:
+                export.write_json(data, output_path)
+
+    def _save_parallel(self, output_path, output_type, jobs, note=None):
+        # Workers get the module with its aggregated data, never the records
+        plots = [part.tolist() for part in np.array_split(np.arange(self.num_plots), jobs)]
+        temp_dir = None
         if output_type == Visualization.PDF_OUTPUT:
-            pp = PdfPages(output_path)
-            pp.savefig()
+            # Consecutive plots per worker, their files are merged in order
+            temp_dir = tempfile.mkdtemp(prefix='.logviz-', dir=os.path.dirname(
+                os.path.abspath(output_path)))
+            parts = [os.path.join(temp_dir, '{}.pdf'.format(index)) for index in range(jobs)]
+        else:
+            parts = [output_path] * jobs
+
+        pool = multiprocessing.Pool(jobs)
+        try:
+            pool.map(_render_plots, [(self.module, part_plots, output_type, path, note)
+                                     for part_plots, path in zip(plots, parts)], chunksize=1)
+            if temp_dir is not None:
+                merger = _pdf_merger()()
+                for path in parts:
+                    merger.append(path)
+                with open(output_path, 'wb') as fhandle:
+                    merger.write(fhandle)
+                merger.close()
+        finally:
+            pool.close()
+            pool.join()
+            if temp_dir is not None:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def plot_path(output_path, module, plot, num_plots):
+    """Names the file of a plot saved on its own.
+
+    Returns:
+        str: ``output_path`` if it is the only plot, otherwise the plot name
+        is appended to its stem, e.g. ``out_encode_1024.png``
+    """
+    if num_plots == 1:
+        return output_path
+    stem, ext = os.path.splitext(output_path)
+    return '{}_{}{}'.format(stem, module.plot_name(plot), ext)
+
+
+def paint_heatmap(fig, grid, xlabels, ylabels, xlabel, ylabel, title, unit):
+    """Paints a grid as a 2-D heatmap, much faster than a 3-D surface.
+
+    The figure is cleared first. The image is rasterized, so the size of a
+    PDF page does not grow with the grid. Ticks are decimated to fit the
+    axes, and cells are annotated with their value while they are large
+    enough to be read.
+
+    Args:
+        fig (:obj:`matplotlib.figure.Figure`): Figure, reused by every plot
+        grid (:obj:`numpy.ndarray`): Values, one row per y label, NaN for
+            cells without runs
+        xlabels (:obj:`list`): Label of each column
+        ylabels (:obj:`list`): Label of each row
+    """
+    plt = pyplot()
+
+    fig.clf()
+    # Room for labels of ticks, rotated
+    fig.subplots_adjust(bottom=0.18)
+    ax = fig.add_subplot(1, 1, 1)
+    cmap = copy.copy(plt.get_cmap('viridis'))
+    cmap.set_bad('#eeeeee')
+    cells = np.ma.masked_invalid(grid)
+    image = ax.imshow(cells, origin='lower', aspect='auto', interpolation='nearest', cmap=cmap)
+    image.set_rasterized(True)
+
+    # About a label every 0.2 inch, whatever the number of cells
+    box = ax.get_position()
+    width = box.width * fig.get_figwidth()
+    height = box.height * fig.get_figheight()
+    xticks = np.arange(0, len(xlabels), max(int(np.ceil(len(xlabels) / (width / 0.2))), 1))
+    yticks = np.arange(0, len(ylabels), max(int(np.ceil(len(ylabels) / (height / 0.2))), 1))
+    ax.set_xticks(xticks)
+    ax.set_xticklabels([xlabels[i] for i in xticks], fontsize=6, rotation=90)
+    ax.set_yticks(yticks)
+    ax.set_yticklabels([ylabels[i] for i in yticks], fontsize=6)
+
+    # Cells of at least 0.3 x 0.15 inch fit their value
+    if width / max(len(xlabels), 1) >= 0.3 and height / max(len(ylabels), 1) >= 0.15 \
+            and cells.count():
+        middle = (cells.min() + cells.max()) / 2.0
+        for (row, column), value in np.ndenumerate(grid):
+            if not np.isnan(value):
+                text = '{:.0f}' if abs(value) >= 100 else '{:.3g}'
+                ax.text(column, row, text.format(value), ha='center', va='center',
+                        fontsize=5, color='k' if value > middle else 'w')
+
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.set_title(title)
+    fig.colorbar(image, ax=ax).set_label(unit)
+
+
+def paint_comparison(fig, module, grids, labels, mode, reference, title, unit, xlabel, ylabel,
+                     subtitle='', lower_is_better=False):
+    """Paints grids of several logs, overlaid or against a reference log.
+
+    Args:
+        fig (:obj:`matplotlib.figure.Figure`): Figure, cleared beforehand
+        module (:obj:`AbstractModule`): Module holding the ticks of the
+            grids, see ``generate_ticks()``
+        grids (:obj:`list` of :obj:`numpy.ndarray`): Grid of each label,
+            NaN for cells without runs
+        labels (:obj:`list` of :str:): Label of each grid, e.g. coders
+        mode (:str:): ``surface``, ``speedup`` or ``delta``
+        reference (:str:): Label the others are compared to, the first one
+            by default
+        subtitle (:str:): Tells the plot apart, e.g. ``decode, 1024 blocks``
+        lower_is_better (:bool:): Values are e.g. times, speedups are
+            inverted and deltas colored the other way round
+    """
+    from mpl_toolkits.mplot3d import axes3d
+    import matplotlib.patches as mpatches
+    plt = pyplot()
+
+    if mode == 'surface':
+        ax = fig.gca(projection='3d')
+        xticks, yticks = np.meshgrid(np.arange(grids[0].shape[1]), np.arange(grids[0].shape[0]))
+        colors = plt.rcParams['axes.prop_cycle'].by_key()['color']
+        handles = []
+        for index, (label, grid) in enumerate(zip(labels, grids)):
+            color = colors[index % len(colors)]
+            ax.plot_surface(xticks, yticks, grid, color=color, alpha=0.4)
+            handles.append(mpatches.Patch(color=color, label=label))
+        ax.set_xticks(module.xticks)
+        ax.set_xticklabels(module.xtick_labels, fontsize=6)
+        ax.set_yticks(module.yticks)
+        ax.set_yticklabels(module.ytick_labels, fontsize=6)
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel(ylabel)
+        ax.set_zlabel('{} ({})'.format(title, unit))
+        ax.legend(handles=handles, loc='upper left', fontsize=6, frameon=False)
+        plt.title('{} - {}'.format(title, ' vs '.join(labels))
+                  + (' ({})'.format(subtitle) if subtitle else ''))
+        return
+
+    # Heatmaps of every other log against the reference one
+    reference = reference if reference is not None else labels[0]
+    base = grids[labels.index(reference)]
+    others = [(label, grid) for label, grid in zip(labels, grids) if label != reference]
+    for index, (label, grid) in enumerate(others):
+        ax = fig.add_subplot(1, len(others), index + 1)
+        if mode == 'speedup':
+            # Above 1 is better than the reference, latency included
+            cells = base / grid if lower_is_better else grid / base
+            text = "{:.2f}x"
+            image = ax.imshow(cells, origin='lower', cmap='RdYlGn', aspect='auto',
+                              vmin=min(np.nanmin(cells), 1 / np.nanmax(cells)),
+                              vmax=max(np.nanmax(cells), 1 / np.nanmin(cells)))
+        else:
+            cells = grid - base
+            text = "{:+.3g}"
+            limit = np.nanmax(np.abs(cells))
+            cmap = 'RdYlGn_r' if lower_is_better else 'RdYlGn'
+            image = ax.imshow(cells, origin='lower', cmap=cmap, aspect='auto',
+                              vmin=-limit, vmax=limit)
+        for (row, column), value in np.ndenumerate(cells):
+            if not np.isnan(value):
+                ax.text(column, row, text.format(value), ha='center', va='center', fontsize=4)
+        ax.set_xticks(module.xticks)
+        ax.set_xticklabels(module.xtick_labels, fontsize=5, rotation=90)
+        ax.set_yticks(module.yticks)
+        ax.set_yticklabels(module.ytick_labels, fontsize=5)
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel(ylabel)
+        ax.set_title('{} vs {}'.format(label, reference), fontsize=8)
+        fig.colorbar(image, ax=ax)
+    fig.suptitle('{} {}'.format(title, mode) + (' - {}'.format(subtitle) if subtitle else ''))
+
+
+def _paint_plots(task):
+    """Paints plots on a single figure, reused by every plot.
+
+    Args:
+        task (:obj:`tuple`): ``(module, plots, output_type, output_path,
+            note)``, plots are pages of the PDF at ``output_path``, or PNG
+            files named by :func:`plot_path`. The note, if any, is written
+            in a corner of every plot.
+    """
+    module, plots, output_type, output_path, note = task
+    plt = pyplot()
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    num_plots = module.num_plots()
+    fig = plt.figure()
+    pp = PdfPages(output_path) if output_type == Visualization.PDF_OUTPUT else None
+    try:
+        for plot in plots:
+            with profiler.stage('paint'):
+                module.paint(fig, plot)
+                # Plots may clear the figure or not, the note is added to each
+                text = fig.text(0.01, 0.01, note, fontsize=7, color='0.4') if note else None
+
+            # fig.tight_layout()
+            with profiler.stage('save'):
+                if output_type == Visualization.PDF_OUTPUT:
+                    pp.savefig(fig)
+                elif output_type == Visualization.PNG_OUTPUT:
+                    fig.savefig(plot_path(output_path, module, plot, num_plots))
+            if text is not None:
+                text.remove()
+    finally:
+        if pp is not None:
             pp.close()
-        elif output_type == Visualization.PNG_OUTPUT:
-            fig.savefig(output_path)
-            plt.close(fig)
+        plt.close(fig)
+
+
+def _render_plots(task):
+    """Paints plots in a worker process, see :func:`_paint_plots`."""
+    # Workers never show figures, whatever the backend of their parent
+    pyplot().switch_backend('Agg')
+    _paint_plots(task)
+
+
+def _pdf_merger():
+    """Imports PyPDF2, which is optional.
+
+    Returns:
+        type: ``PyPDF2.PdfFileMerger``, ``None`` if PyPDF2 is missing
+    """
+    try:
+        from PyPDF2 import PdfFileMerger
+    except ImportError:
+        return None
+    return PdfFileMerger
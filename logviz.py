@@ -3,19 +3,442 @@
 log visualizer.
 '''
 
+import argparse
+import json
 import os
 import sys
 
+from core import batch
+from core import cache
+from core import compare
+from core import follow
+from core import history
+from core import index
 from core import parser
+from core import query
+from core import server
+from core import timing
 from core import viz
 from module import ModuleController as mc
+from util import SizeUtils
 
 
-def main(log_type, sub_type, in_log, output_path):
+"""Output format => output type of core.viz.Visualization"""
+OUTPUT_TYPES = {
+    'pdf': viz.Visualization.PDF_OUTPUT,
+    'png': viz.Visualization.PNG_OUTPUT,
+    'html': viz.Visualization.HTML_OUTPUT,
+    'json': viz.Visualization.JSON_OUTPUT,
+}
+
+
+def main(log_type, sub_type, in_log, output_path, jobs=1, parse_cache=None,
+         parse_only=False, interpolate=False, output_format=None, max_grid=64,
+         parse_index=None, filters=None, history_path=None, build=None, timestamp=None,
+         renderers=None, preview=None, preview_bytes=parser.Parser.PREVIEW_BYTES,
+         full_after_preview=False):
+    module = mc().get_module(log_type, sub_type)
+    module.interpolate = interpolate
+    module.renderer = viz.pick_renderer(renderers, sub_type, module.renderer)
+    filters = query.parse_filters(filters, module.schema()) if filters else None
+    inlog = parser.Parser(in_log, module, jobs=jobs, cache=parse_cache, index=parse_index,
+                          filters=filters)
+    output_type = get_output_type(output_path, output_format)
+
+    if preview:
+        info = inlog.preview(windows=preview, window_bytes=preview_bytes)
+        report_malformed(in_log, inlog.get_malformed())
+        parsed, size = inlog.get_coverage()
+        note = 'Preview: {:.1%} of the log, {} records'.format(
+            parsed / float(size or 1), len(info) if info else 0)
+        sys.stderr.write(note + '\n')
+        if not info:
+            # The rest of the log may still hold some
+            report_no_records(in_log, filters, 'Warning' if full_after_preview else 'Error')
+            if not full_after_preview:
+                return False
+        else:
+            draw(module, info, inlog.get_malformed(), output_path, output_type, parse_only, jobs,
+                 max_grid, note)
+        if not full_after_preview:
+            return True
+
+    # Windows of a preview are not parsed again
+    info = inlog.get_info()
+    report_malformed(in_log, inlog.get_malformed())
+    if not info:
+        report_no_records(in_log, filters)
+        return False
+    logviz = draw(module, info, inlog.get_malformed(), output_path, output_type, parse_only,
+                  jobs, max_grid)
+    if logviz is not None and history_path is not None:
+        store = history.History(history_path)
+        try:
+            store.add(in_log, log_type, sub_type, module, build=build, timestamp=timestamp)
+        finally:
+            store.close()
+    return True
+
+
+def draw(module, info, malformed, output_path, output_type, parse_only=False, jobs=1,
+         max_grid=64, note=None):
+    if parse_only:
+        export_json(info, malformed, output_path)
+        return None
+    logviz = viz.Visualization(info, module)
+    if output_type in (viz.Visualization.HTML_OUTPUT, viz.Visualization.JSON_OUTPUT):
+        logviz.export(output_path, output_type=output_type, max_grid=max_grid, note=note)
+    else:
+        logviz.save(output_path, output_type=output_type, jobs=jobs, note=note)
+    return logviz
+
+
+def main_follow(log_type, sub_type, in_log, output_path, interval, poll):
     module = mc().get_module(log_type, sub_type)
     inlog = parser.Parser(in_log, module)
-    logviz = viz.Visualization(inlog.get_info(), module)
-    logviz.save(output_path, output_type=viz.Visualization.PDF_OUTPUT)
+    follower = follow.Follower(inlog, module, output_path, interval=interval, poll=poll)
+    follower.run()
+    report_malformed(in_log, inlog.get_malformed())
+
+
+def main_batch(log_type, entries, output_dir, jobs=1, parse_cache=None, history_path=None,
+               renderers=None):
+    runner = batch.Batch(log_type, output_dir, jobs=jobs, cache=parse_cache,
+                         history=history_path, renderers=renderers)
+    timings = runner.run(entries)
+    print(batch.Batch.summary(timings))
+    return all(timing['error'] is None for timing in timings)
+
+
+def main_compare(log_type, sub_type, in_logs, output_path, by='coder', mode='surface',
+                 reference=None, jobs=1, parse_cache=None, interpolate=False):
+    module = mc().get_module(log_type, sub_type)
+    module.interpolate = interpolate
+    datasets = []
+    for label, in_log in zip(log_labels(in_logs), in_logs):
+        inlog = parser.Parser(in_log, module, jobs=jobs, cache=parse_cache)
+        info = inlog.get_info()
+        report_malformed(in_log, inlog.get_malformed())
+        if info is False:
+            sys.stderr.write('Warning: cannot read {}, skipped\n'.format(in_log))
+            continue
+        datasets.append((label, info))
+    comparison = compare.Comparison(datasets, module, by=by)
+    problem = comparison.check(mode, reference)
+    if problem is not None:
+        sys.stderr.write('Error: {}\n'.format(problem))
+        return False
+    comparison.save(output_path, mode=mode, reference=reference)
+    return True
+
+
+def main_trend(history_path, output_path, log_type, sub_type, coder=None, method=None,
+               chunk_size=None, threads_num=None, since=None, window=5, tolerance=0.1):
+    store = history.History(history_path)
+    try:
+        series, unit, higher_is_better = store.trend(
+            log_type, sub_type, coder=coder, method=method, chunk_size=chunk_size,
+            threads_num=threads_num, since=since)
+    finally:
+        store.close()
+    if not series:
+        sys.stderr.write('Warning: no {} {} results in {}\n'.format(log_type, sub_type, history_path))
+    found = history.regressions(series, higher_is_better, window=window, tolerance=tolerance)
+    history.save_trend(series, found, output_path, '{} {} trend'.format(log_type, sub_type), unit)
+
+    for coder, method, _, build, value, baseline, change in found:
+        print('Regression: {} {} in {}: {:.2f} {} vs {:.2f} ({:+.0%})'.format(
+            coder, method, build, value, unit, baseline, change))
+    # Only regressions of the last runs fail, older ones are known already
+    latest = set((coder, method, points[-1][0]) for (coder, method), points in series.items())
+    return not any((coder, method, timestamp) in latest
+                   for coder, method, timestamp, _, _, _, _ in found)
+
+
+def log_labels(in_logs):
+    # Logs are named after their file, or their path if files share a name
+    labels = [os.path.splitext(os.path.basename(in_log))[0] for in_log in in_logs]
+    if len(set(labels)) < len(labels):
+        labels = list(in_logs)
+    return labels
+
+
+def get_output_type(output_path, output_format=None):
+    # Named after the extension of the output unless told otherwise
+    if output_format is None:
+        output_format = os.path.splitext(output_path)[1][1:].lower()
+        output_format = {'htm': 'html'}.get(output_format, output_format)
+    return OUTPUT_TYPES.get(output_format, viz.Visualization.PDF_OUTPUT)
+
+
+def export_json(info, malformed, output_path):
+    output = {
+        'records': len(info),
+        'fields': info.to_dict(),
+        'malformed': [{'offset': offset, 'reason': reason} for offset, reason in malformed],
+    }
+    if output_path == '-':
+        json.dump(output, sys.stdout)
+    else:
+        with open(output_path, 'w') as fhandle:
+            json.dump(output, fhandle)
+
+
+def report_malformed(in_log, malformed):
+    if not malformed:
+        return
+    sys.stderr.write('Warning: {} malformed records in {}\n'.format(len(malformed), in_log))
+    for offset, reason in malformed[:10]:
+        sys.stderr.write('  at byte {}: {}\n'.format(offset, reason))
+
+
+def report_no_records(in_log, filters, level='Error'):
+    if filters:
+        sys.stderr.write('{}: no records of {} hold the filters {}\n'.format(
+            level, in_log, ','.join(str(predicate) for predicate in filters)))
+    else:
+        sys.stderr.write('{}: no records in {}\n'.format(level, in_log))
+
+
+def profiled(args, func, *func_args, **func_kwargs):
+    if not (args.profile or args.profile_stats or args.trace):
+        return func(*func_args, **func_kwargs)
+
+    timing.profiler.enable()
+    stats = None
+    if args.profile_stats:
+        import cProfile
+        stats = cProfile.Profile()
+        stats.enable()
+    try:
+        return func(*func_args, **func_kwargs)
+    finally:
+        if stats is not None:
+            stats.disable()
+            stats.dump_stats(args.profile_stats)
+        if args.trace:
+            timing.profiler.write_trace(args.trace)
+        sys.stderr.write(timing.profiler.report() + '\n')
+
+
+def add_cache_args(argparser):
+    argparser.add_argument('--cache-dir', default=cache.ParseCache.DEFAULT_DIRECTORY,
+                           help='Directory caching parsed logs')
+    argparser.add_argument('--cache-size', type=int,
+                           default=cache.ParseCache.DEFAULT_MAX_BYTES // (1024 * 1024),
+                           help='Size of the cache in MB')
+    argparser.add_argument('--no-cache', action='store_true',
+                           help='Always parse the log')
+
+
+def get_cache(args):
+    if args.no_cache:
+        return None
+    return cache.ParseCache(args.cache_dir, args.cache_size * 1024 * 1024)
+
+
+def positive_int(text):
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError('{} is not a positive number'.format(text))
+    return value
+
+
+def positive_size(text):
+    value = SizeUtils.convert_size(text)
+    if value is None or value <= 0:
+        raise argparse.ArgumentTypeError('{} is not a positive size, e.g. 4MB'.format(text))
+    return int(value)
+
+
+def renderers_arg(text):
+    pairs = []
+    for item in text.split(','):
+        sub_type, _, renderer = item.strip().rpartition('=')
+        if renderer not in viz.RENDERERS:
+            raise argparse.ArgumentTypeError('{} is not one of {}'.format(renderer, viz.RENDERERS))
+        pairs.append((sub_type or None, renderer))
+    return pairs
+
+
+def add_renderer_args(argparser):
+    argparser.add_argument('--renderer', type=renderers_arg, action='append',
+                           metavar='[SUB_TYPE=]RENDERER',
+                           help='Paint grids as 3-D surfaces, or as 2-D heatmaps, much faster '
+                                'for large sweeps, one of {}. Applies to every sub type, or to '
+                                'the sub types given as pairs separated by commas, e.g. '
+                                'Throughput=heatmap,Latency=surface. Set by the module for each '
+                                'sub type by default'.format(', '.join(viz.RENDERERS)))
+
+
+def get_renderers(args):
+    # Sub type => renderer, key None for every sub type not given by name
+    return dict(pair for pairs in args.renderer or [] for pair in pairs)
+
+
+def add_history_args(argparser):
+    argparser.add_argument('--history', metavar='DB',
+                           help='Also store aggregated results in this SQLite database, '
+                                'see the trend command')
+
+
+def get_index(args):
+    if args.no_index:
+        return None
+    return index.SidecarIndex()
+
+
+def parse_args(argv):
+    argparser = argparse.ArgumentParser(description='Visualize benchmark logs.')
+    argparser.add_argument('log_type', help='Module parsing the log, e.g. ECB')
+    argparser.add_argument('sub_type', help='Figure to draw, e.g. Throughput')
+    argparser.add_argument('in_log', help='Log file')
+    argparser.add_argument('output_path', help='Output file')
+    argparser.add_argument('-j', '--jobs', type=int, default=1,
+                           help='Number of processes parsing the log and painting its plots, '
+                                '0 for one per CPU core. Pages of a PDF are only painted in '
+                                'parallel if PyPDF2 is installed')
+    argparser.add_argument('--format', choices=sorted(OUTPUT_TYPES), dest='output_format',
+                           help='Format of the output, from its extension by default '
+                                '(PDF otherwise). HTML and JSON hold the results without '
+                                'drawing them')
+    argparser.add_argument('--max-grid', type=int, default=64,
+                           help='Largest number of chunk sizes and threads exported to '
+                                'HTML or JSON, larger sweeps are averaged down')
+    argparser.add_argument('--parse-only', action='store_true',
+                           help='Write parsed records as JSON instead of a figure, '
+                                'to stdout if output_path is -')
+    argparser.add_argument('--profile', action='store_true',
+                           help='Report time, memory and throughput of each stage')
+    argparser.add_argument('--profile-stats', metavar='FILE',
+                           help='Also dump cProfile stats to FILE (implies --profile)')
+    argparser.add_argument('--trace', metavar='FILE',
+                           help='Also write stages in Chrome trace format to FILE '
+                                '(implies --profile)')
+    argparser.add_argument('--interpolate', action='store_true',
+                           help='Fill cells of the sweep without runs from their neighbours')
+    add_renderer_args(argparser)
+    add_cache_args(argparser)
+    argparser.add_argument('--filter', action='append', metavar='PREDICATES',
+                           help='Only draw records holding predicates separated by commas, '
+                                'e.g. method=decode,chunk_size>=64KB,threads<=32. Once the '
+                                'log is indexed, only sections of matching records are parsed')
+    argparser.add_argument('--no-index', action='store_true',
+                           help='Neither read nor write the index of the log, <log>'
+                                + index.SidecarIndex.SUFFIX)
+    argparser.add_argument('--preview', type=positive_int, metavar='WINDOWS',
+                           help='Only parse this many evenly spaced windows of the log, for a '
+                                'quick look at huge logs')
+    argparser.add_argument('--preview-size', type=positive_size,
+                           default=parser.Parser.PREVIEW_BYTES,
+                           help='Size of each window of --preview, e.g. 4MB')
+    argparser.add_argument('--full', action='store_true',
+                           help='After drawing the --preview, parse the rest of the log and '
+                                'draw it again, over the same output')
+    add_history_args(argparser)
+    argparser.add_argument('--build',
+                           help='Build the log comes from, stored with --history, '
+                                'name of the log by default')
+    argparser.add_argument('--timestamp',
+                           help='Time of the build, stored with --history, e.g. '
+                                '"2018-04-05 10:00", mtime of the log by default')
+    argparser.add_argument('-f', '--follow', action='store_true',
+                           help='Keep parsing the log as it grows, until interrupted')
+    argparser.add_argument('--interval', type=float, default=30,
+                           help='Seconds between renders when following the log')
+    argparser.add_argument('--poll', type=float, default=2,
+                           help='Seconds between checks of the log when following it')
+    return argparser.parse_args(argv)
+
+
+def parse_batch_args(argv):
+    argparser = argparse.ArgumentParser(prog='logviz.py batch',
+                                        description='Visualize many benchmark logs.')
+    argparser.add_argument('log_type', help='Module parsing the logs, e.g. ECB')
+    argparser.add_argument('logs', nargs='*', help='Log files or globs of log files')
+    argparser.add_argument('-m', '--manifest',
+                           help='File listing one log (or glob) per line, optionally '
+                                'followed by its sub types')
+    argparser.add_argument('-s', '--sub-types', nargs='+', required=True,
+                           help='Figures to draw for each log, e.g. Throughput Latency')
+    argparser.add_argument('-o', '--output-dir', default='.',
+                           help='Directory of the figures, named <log name>_<sub type>.pdf')
+    argparser.add_argument('-j', '--jobs', type=int, default=0,
+                           help='Number of processes, 0 for one per CPU core')
+    add_renderer_args(argparser)
+    add_cache_args(argparser)
+    add_history_args(argparser)
+    return argparser.parse_args(argv)
+
+
+def parse_trend_args(argv):
+    argparser = argparse.ArgumentParser(prog='logviz.py trend',
+                                        description='Draw results stored with --history over '
+                                                    'time, and report regressions.')
+    argparser.add_argument('history', metavar='DB', help='SQLite database of results')
+    argparser.add_argument('output_path', help='Output file, PDF or PNG')
+    argparser.add_argument('-t', '--type', default='ECB', dest='log_type',
+                           help='Module the logs were parsed with')
+    argparser.add_argument('-s', '--sub-type', default='Throughput',
+                           help='Figure the results were drawn for, e.g. Throughput')
+    argparser.add_argument('--coder', help='Only this coder, as named in figures')
+    argparser.add_argument('--method', help='Only this method, e.g. encode')
+    argparser.add_argument('--chunk-size', type=SizeUtils.convert_size,
+                           help='Only this chunk size, e.g. 64KB')
+    argparser.add_argument('--threads', type=int, dest='threads_num',
+                           help='Only this number of threads')
+    argparser.add_argument('--since', help='Only runs since this time, e.g. 2018-04-01')
+    argparser.add_argument('--window', type=int, default=5,
+                           help='Number of earlier runs each run is compared to')
+    argparser.add_argument('--tolerance', type=float, default=0.1,
+                           help='Relative change reported as regression')
+    return argparser.parse_args(argv)
+
+
+def parse_compare_args(argv):
+    argparser = argparse.ArgumentParser(prog='logviz.py compare',
+                                        description='Compare benchmark logs in one figure.')
+    argparser.add_argument('log_type', help='Module parsing the logs, e.g. ECB')
+    argparser.add_argument('sub_type', help='Figure to draw, e.g. Throughput')
+    argparser.add_argument('output_path', help='Output file')
+    argparser.add_argument('logs', nargs='+', help='Log files')
+    argparser.add_argument('--by', choices=['coder', 'file'], default='coder',
+                           help='Compare the coders found in the logs, or the logs themselves')
+    argparser.add_argument('--mode', choices=compare.Comparison.MODES, default='surface',
+                           help='Overlaid surfaces, or speedup/delta heatmaps '
+                                'against the reference')
+    argparser.add_argument('--reference',
+                           help='Coder (or log name) the others are compared to, '
+                                'the first one in order by default')
+    argparser.add_argument('-j', '--jobs', type=int, default=1,
+                           help='Number of processes parsing each log, 0 for one per CPU core')
+    argparser.add_argument('--interpolate', action='store_true',
+                           help='Fill cells of the sweep without runs from their neighbours')
+    argparser.add_argument('--profile', action='store_true',
+                           help='Report time, memory and throughput of each stage')
+    argparser.add_argument('--profile-stats', metavar='FILE',
+                           help='Also dump cProfile stats to FILE (implies --profile)')
+    argparser.add_argument('--trace', metavar='FILE',
+                           help='Also write stages in Chrome trace format to FILE '
+                                '(implies --profile)')
+    add_cache_args(argparser)
+    return argparser.parse_args(argv)
+
+
+def parse_serve_args(argv):
+    argparser = argparse.ArgumentParser(prog='logviz.py serve',
+                                        description='Serve figures of benchmark logs over HTTP, '
+                                                    'keeping parsed logs in memory.')
+    argparser.add_argument('--host', default='127.0.0.1')
+    argparser.add_argument('--port', type=int, default=8080)
+    argparser.add_argument('--root', default='.',
+                           help='Directory of the logs, requests cannot read outside of it')
+    argparser.add_argument('-j', '--jobs', type=int, default=0,
+                           help='Number of processes painting figures, 0 for one per CPU core')
+    argparser.add_argument('--max-entries', type=int, default=16,
+                           help='Number of parsed logs kept in memory')
+    add_cache_args(argparser)
+    return argparser.parse_args(argv)
 
 
 def set_include_path():
@@ -25,7 +448,59 @@ def set_include_path():
 if __name__ == "__main__":
     set_include_path()
 
-    if not os.path.isfile(sys.argv[3]):
-        raise Exception('Cannot find log file {}'.format(sys.argv[2]))
+    if sys.argv[1:2] == ['batch']:
+        args = parse_batch_args(sys.argv[2:])
+        entries = batch.expand(args.logs, args.sub_types)
+        if args.manifest:
+            entries.extend(batch.read_manifest(args.manifest, args.sub_types))
+        succeeded = main_batch(args.log_type, entries, args.output_dir, jobs=args.jobs,
+                               parse_cache=get_cache(args), history_path=args.history,
+                               renderers=get_renderers(args))
+        sys.exit(0 if succeeded else 1)
+
+    if sys.argv[1:2] == ['trend']:
+        args = parse_trend_args(sys.argv[2:])
+        succeeded = main_trend(args.history, args.output_path, args.log_type, args.sub_type,
+                               coder=args.coder, method=args.method, chunk_size=args.chunk_size,
+                               threads_num=args.threads_num, since=history.parse_time(args.since),
+                               window=args.window, tolerance=args.tolerance)
+        sys.exit(0 if succeeded else 1)
+
+    if sys.argv[1:2] == ['serve']:
+        args = parse_serve_args(sys.argv[2:])
+        service = server.Service(args.root, jobs=args.jobs, max_entries=args.max_entries,
+                                 cache=get_cache(args))
+        sys.stderr.write('Serving {} on http://{}:{}/\n'.format(service.root, args.host, args.port))
+        server.serve(service, args.host, args.port)
+        sys.exit(0)
+
+    if sys.argv[1:2] == ['compare']:
+        args = parse_compare_args(sys.argv[2:])
+        for in_log in args.logs:
+            if not os.path.isfile(in_log):
+                raise Exception('Cannot find log file {}'.format(in_log))
+        succeeded = profiled(args, main_compare, args.log_type, args.sub_type, args.logs,
+                             args.output_path, by='source' if args.by == 'file' else 'coder',
+                             mode=args.mode, reference=args.reference, jobs=args.jobs,
+                             parse_cache=get_cache(args), interpolate=args.interpolate)
+        sys.exit(0 if succeeded else 1)
+
+    args = parse_args(sys.argv[1:])
+
+    if args.follow:
+        main_follow(args.log_type, args.sub_type, args.in_log, args.output_path,
+                    args.interval, args.poll)
+    else:
+        if not os.path.isfile(args.in_log):
+            raise Exception('Cannot find log file {}'.format(args.in_log))
 
-    main(sys.argv[1], sys.argv[2], sys.argv[3], sys.argv[4])
+        succeeded = profiled(
+            args, main, args.log_type, args.sub_type, args.in_log, args.output_path,
+            jobs=args.jobs, parse_cache=get_cache(args), parse_only=args.parse_only,
+            interpolate=args.interpolate, output_format=args.output_format,
+            max_grid=args.max_grid, parse_index=get_index(args), filters=args.filter,
+            history_path=args.history, build=args.build,
+            timestamp=history.parse_time(args.timestamp), renderers=get_renderers(args),
+            preview=args.preview, preview_bytes=args.preview_size,
+            full_after_preview=args.full)
+        sys.exit(0 if succeeded else 1)
@@ -3,22 +3,65 @@
 :mod:`module.AbstractModule`
 '''
 
+from core.matcher import RegexMatcher
+
+class UnknownModuleError(Exception):
+    '''
+    Raised for names of modules, or of their sub types, which don't exist.
+    '''
+
 class AbstractModule(object):
     '''
     AbstractModule lists the methods that needs to implement.
+    ``split_info`` turns matched records into :class:`core.records.Records`,
+    which is the data given to the other methods.
     '''
     def delimeter(self):
         raise NotImplementedError("Should have implemented this method")
     def pattern(self):
         raise NotImplementedError("Should have implemented this method")
+    def matcher(self):
+        return RegexMatcher(self.pattern())
+    def anchors(self):
+        # Literals found in every section holding a record, sections
+        # without them are skipped by the parser before any matching
+        return []
     def split_info(self, parts):
         raise NotImplementedError("Should have implemented this method")
+    def schema(self):
+        # Field => type of the records, see core.records, needed to filter them
+        raise NotImplementedError("Should have implemented this method")
+    def index_fields(self):
+        # Fields kept in the sidecar index of logs (see core.index),
+        # filters on them only parse the sections of matching records
+        return []
+    def version(self):
+        # Parsed data cached with another version is parsed again
+        return self.pattern().pattern
 
     def num_plots(self):
+        # Each plot is a page of the PDF, or a PNG file of its own
         raise NotImplementedError("Should have implemented this method")
+    def plot_name(self, plot):
+        return str(plot)
     def xy_data(self, data):
         raise NotImplementedError("Should have implemented this method")
     def preprocess_data(self, data):
         raise NotImplementedError("Should have implemented this method")
-    def paint(self, fig):
+    def update_data(self, data):
+        # Only needed to follow logs still being written
+        raise NotImplementedError("Should have implemented this method")
+    def paint(self, fig, plot):
+        raise NotImplementedError("Should have implemented this method")
+    def export_data(self, max_grid):
+        # Only needed to export HTML or JSON, see core.export
+        raise NotImplementedError("Should have implemented this method")
+    def history_data(self):
+        # Only needed to keep results in a history store, see core.history
+        raise NotImplementedError("Should have implemented this method")
+
+    def compare_data(self, data, by):
+        # Only needed to compare logs
+        raise NotImplementedError("Should have implemented this method")
+    def paint_comparison(self, fig, mode, reference, plot):
         raise NotImplementedError("Should have implemented this method")
@@ -5,17 +5,16 @@
 
 import re
 import math
-from mpl_toolkits.mplot3d import axes3d
-from matplotlib import cm
-from scipy.interpolate import griddata
-import matplotlib.patches as mpatches
-import matplotlib.pyplot as plt
 
 import numpy as np
 
-from module import AbstractModule
+from module import AbstractModule, UnknownModuleError
+from core import export
+from core.grid import dense_grids, fill_gaps
+from core.matcher import LineMatcher
+from core.records import Aggregate, Records
+from core.viz import paint_comparison, paint_heatmap, pyplot
 from util import SizeUtils
-from util import NumberUtils
 
 class ECB(AbstractModule):
     '''
@@ -24,96 +23,151 @@ class ECB(AbstractModule):
     """Regexp pattern for logs generated by RawErasureCoderBenchmark."""
     PATTERN_ECB = r"Using (?P<buffer_size>\S+) buffer\.\n(?:.*?\n)*?(?P<coder>.*?) coder (?P<method>\S+?)\s(?P<total_data_size>\S+) data, with chunk size (?P<chunk_size>.*?)\nTotal time: (?P<total_time>.*?)\ss\.\nTotal throughput: (?P<total_throughput>.*?) MB/s\nThreads statistics:\s*(?P<threads_num>.*?) threads in total\.\nMin: (?P<time_min>.*?) s, Max: (?P<time_max>.*?) s, Avg: (?P<time_avg>.*?) s, 90th Percentile: (?P<time_90>.*?) s\."
 
+    """Per-line (anchor, regexp) steps of the same records, matched in linear time."""
+    LINES_ECB = [
+        ("Using ", r"Using (?P<buffer_size>\S+) buffer\.$"),
+        (" coder ", r"(?P<coder>.*?) coder (?P<method>\S+?)\s(?P<total_data_size>\S+) data, with chunk size (?P<chunk_size>.*?)$"),
+        ("Total time: ", r"Total time: (?P<total_time>.*?)\ss\.$"),
+        ("Total throughput: ", r"Total throughput: (?P<total_throughput>.*?) MB/s$"),
+        ("Threads statistics:", r"Threads statistics:(?:\s*(?P<threads_num>\S+) threads in total\.)?$"),
+        (" threads in total.", r"(?P<threads_num>\S+) threads in total\.$"),
+        ("Min: ", r"Min: (?P<time_min>.*?) s, Max: (?P<time_max>.*?) s, Avg: (?P<time_avg>.*?) s, 90th Percentile: (?P<time_90>.*?) s\.$"),
+    ]
+
     """Regexp terms for finding fields in ECB logs"""
     FIELDS_ECB = [
         'buffer_size', 'coder', 'method', 'total_data_size', 'chunk_size', 'total_time',
         'total_throughput', 'threads_num', 'time_min', 'time_max', 'time_avg', 'time_90'
     ]
 
+    """Type of each field, see :meth:`core.records.Records.from_strings`"""
+    SCHEMA_ECB = {
+        'buffer_size': 'size', 'coder': 'string', 'method': 'string',
+        'total_data_size': 'size', 'chunk_size': 'size', 'total_time': 'float',
+        'total_throughput': 'float', 'threads_num': 'int', 'time_min': 'float',
+        'time_max': 'float', 'time_avg': 'float', 'time_90': 'float'
+    }
+
     TYPES_ECB = [
         "TotalThroughput", "Throughput", "Latency"
     ]
 
+    """Renderer of each sub type, one of ``core.viz.RENDERERS``"""
+    RENDERERS_ECB = {
+        "TotalThroughput": "surface", "Throughput": "surface", "Latency": "surface"
+    }
+
+    """Version of parsed data, to be increased whenever parsing changes."""
+    VERSION_ECB = 2
+
+    _compiled = None
+    _steps = None
+
     def __init__(self, sub_type):
         if sub_type not in self.TYPES_ECB:
-            raise Exception("{} is not one of {}".format(sub_type, self.TYPES_ECB))
+            raise UnknownModuleError("{} is not one of {}".format(sub_type, self.TYPES_ECB))
         self.sub_type = sub_type
+        self.interpolate = False
+        """(:obj:`bool`): Paint cells without runs by interpolating their neighbours"""
+        self.renderer = self.RENDERERS_ECB[sub_type]
+        """(:obj:`str`): One of ``core.viz.RENDERERS``, set per sub type by default"""
 
     def delimeter(self):
         return "**********"
     def pattern(self):
-        return re.compile(self.PATTERN_ECB)
+        # Compiled once, shared by every instance
+        if ECB._compiled is None:
+            ECB._compiled = re.compile(self.PATTERN_ECB)
+        return ECB._compiled
+    def matcher(self):
+        # Noise (JVM warnings, GC logs) may show up before the coder line
+        if ECB._steps is None:
+            ECB._steps = [(anchor, re.compile(regex)) for anchor, regex in self.LINES_ECB]
+        return LineMatcher(ECB._steps, gaps=(1,))
+    def anchors(self):
+        # Records start on this line, truncated ones included
+        return [self.LINES_ECB[0][0]]
+    def version(self):
+        return self.VERSION_ECB
+    def schema(self):
+        return self.SCHEMA_ECB
+    def index_fields(self):
+        return ['coder', 'method', 'chunk_size', 'threads_num']
     def split_info(self, parts):
         fields = self.FIELDS_ECB
-        results = []
-
-        for part in parts:
-            result = {}
-            for sectionname in fields:
-                value = part[sectionname]
-                if sectionname == 'buffer_size':
-                    value = SizeUtils.convert_size(value)
-                if sectionname == 'chunk_size':
-                    value = SizeUtils.convert_size(value)
-                if sectionname == 'total_data_size':
-                    value = SizeUtils.convert_size(value)
-                value = NumberUtils.as_number_otherwise_string(value)
-                result[sectionname] = value
-            results.append(result)
-        return results
+        return Records.from_strings(
+            dict((sectionname, [part[sectionname] for part in parts]) for sectionname in fields),
+            self.SCHEMA_ECB)
     def num_plots(self):
-        return 1
+        # One plot per method and number of blocks, e.g. encode and decode
+        return len(self.plots)
+    def plot_name(self, plot):
+        return "{}_{}".format(*self.plots[plot])
     def xy_data(self, data):
-        xdata = set()
-        ydata = set()
-        for cell in data:
-            xdata.add(cell['chunk_size'])
-            ydata.add(cell['threads_num'])
-        self.xdata = sorted(xdata)
-        self.ydata = sorted(ydata)
+        self.xdata = np.unique(data['chunk_size']).tolist()
+        self.ydata = np.unique(data['threads_num']).tolist()
     def preprocess_data(self, data):
-        results = {}
-        for cell in data:
-            coder = cell["coder"].replace("Java", "").strip()
-            if coder == "Mellanox":
-                coder = "Mellanox EC Offload"
-            elif coder == "ISA-L":
-                coder = "Intel ISA-L"
-
-            method = cell["method"]
-            chunk_size = cell["chunk_size"]
-            buffer_size = cell["buffer_size"]
-            threads_num = cell["threads_num"]
-            factor = buffer_size * threads_num
-            iteration = cell["total_data_size"] / factor
-
-            if self.sub_type == "TotalThroughput":
-                result = cell["total_throughput"]
-            elif self.sub_type == "Throughput":
-                result = cell["total_throughput"] / threads_num
-            else:
-                result = cell["time_avg"]
-
-            if method not in results:
-                results[method] = {}
-            if iteration not in results[method]:
-                results[method][iteration] = {}
-            if chunk_size not in results[method][iteration]:
-                results[method][iteration][chunk_size] = {}
-            if threads_num in results[method][iteration][chunk_size] \
-                    and results[method][iteration][chunk_size][threads_num]:
-                results[method][iteration][chunk_size][threads_num].append(result)
-            else:
-                results[method][iteration][chunk_size][threads_num] = [result]
-
-        for method in results:
-            for iteration in results[method]:
-                for chunk_size in results[method][iteration]:
-                    for threads_num in results[method][iteration][chunk_size]:
-                        results[method][iteration][chunk_size][threads_num] = \
-                            np.mean(results[method][iteration][chunk_size][threads_num])
-        self.coder = coder
-        self.results = results
+        self.stats = self.__aggregate(data)
+        self.__set_results(data)
+    def update_data(self, data):
+        xdata, ydata = self.xdata, self.ydata
+        self.xy_data(data)
+        self.xdata = sorted(set(xdata).union(self.xdata))
+        self.ydata = sorted(set(ydata).union(self.ydata))
+        self.stats = self.stats.merge(self.__aggregate(data))
+        self.__set_results(data)
+
+    def compare_data(self, data, by='coder'):
+        # Records of all logs, the source field names the log of each record
+        self.xy_data(data)
+        if by == 'coder':
+            names = [self.__coder_name(coder) for coder in data.labels('coder')]
+            labels = np.asarray(names)[data['coder']]
+        else:
+            labels = data.decode(by)
+
+        stats = self.__aggregate(data, labels)
+        self.labels = np.unique(stats.keys['label']).tolist()
+        self.comparison = self.__grids(stats, self.labels)
+        self.stats = stats
+
+    def __aggregate(self, data, labels=None):
+        threads_num = data['threads_num']
+        iteration = data['total_data_size'] // (data['buffer_size'] * threads_num)
+
+        if self.sub_type == "TotalThroughput":
+            values = data['total_throughput']
+        elif self.sub_type == "Throughput":
+            values = data['total_throughput'] / threads_num.astype(np.float64)
+        else:
+            values = data['time_avg']
+
+        # Repeated runs of a cell are averaged, their spread is kept in stats.
+        # Methods are keyed by name, codes differ between parsed batches.
+        keys = {'method': data.decode('method'), 'iteration': iteration,
+                'chunk_size': data['chunk_size'], 'threads_num': threads_num}
+        if labels is not None:
+            keys['label'] = labels
+        return Aggregate.from_values(keys, values)
+
+    def __coder_name(self, coder):
+        coder = coder.replace("Java", "").strip()
+        if coder == "Mellanox":
+            coder = "Mellanox EC Offload"
+        elif coder == "ISA-L":
+            coder = "Intel ISA-L"
+        return coder
+
+    def __set_results(self, data):
+        # The figure is titled after the coder of the last record
+        self.coder = self.__coder_name(data.labels('coder')[data['coder'][-1]])
+        self.grids = self.__grids(self.stats)[0]
+
+    def __grids(self, stats, labels=None):
+        # One (threads, chunk size) grid per method and number of blocks
+        self.plots, grids = dense_grids(stats, ['method', 'iteration'], 'chunk_size', self.xdata,
+                                        'threads_num', self.ydata, labels)
+        return grids
 
     def generate_ticks(self):
         xcount = len(self.xdata)
@@ -130,29 +184,51 @@ class ECB(AbstractModule):
         self.yticks = np.arange(0, ycount, ytick_label_stepsize)
         self.ytick_labels = [self.ydata[i] for i in self.yticks]
 
-    def paint(self, fig):
-        x_labels = 14
-        y_labels = 7
-        method = "encode"
-        blocks = 1024
+    def paint(self, fig, plot=0):
+        if self.renderer == 'heatmap':
+            return self.__paint_heatmap(fig, plot)
+
+        # Registers the 3d projection
+        from mpl_toolkits.mplot3d import axes3d
+        from matplotlib import cm
+        plt = pyplot()
 
+        x_labels = len(self.xdata)
+        y_labels = len(self.ydata)
+        method, blocks = self.plots[plot]
+
+        # Plots are painted one after another on the same axes
         ax = fig.gca(projection='3d')
-        results = self.results[method][blocks]
-        xticks, yticks = np.meshgrid(self.xticks, self.yticks)
-        xdata, ydata = np.meshgrid(self.xdata, self.ydata)
+        ax.clear()
+        xticks, yticks = np.meshgrid(np.arange(x_labels), np.arange(y_labels))
 
+        zticks = self.grids[plot]
+        if self.interpolate:
+            zticks = fill_gaps(zticks)
         if self.sub_type != "Latency":
-            unit, zticks = self.__throughput_array(results, xdata, ydata)
+            unit, zticks = self.__throughput_array(zticks)
         else:
             unit = "sec"
-            zticks = np.array([results[x][y] for x, y in zip(np.ravel(xdata), np.ravel(ydata))])
 
-        zticks = zticks.reshape(xdata.shape)
+        # Cells without runs are left out of the surface and the contours
+        zticks = np.ma.masked_invalid(zticks)
         ax.plot_surface(xticks, yticks, zticks, alpha=0.6)
-        xtick_labels = [self.xtick_labels[int(x)] for x in ax.get_xticks() if int(x) in range(len(self.xtick_labels))]
-        ytick_labels = [self.ytick_labels[int(y)] for y in ax.get_yticks() if int(y) in range(len(self.ytick_labels))]
-        x_plane = ax.contour(xticks, yticks, zticks, zdir='x', offset=0 - 0.230, cmap=cm.Dark2)
-        y_plane = ax.contour(xticks, yticks, zticks, zdir='y', offset=y_labels - 1 + 0.130, cmap=cm.cool)
+        # Ticks are on grid cells, whatever the size of the grid
+        ax.set_xticks(self.xticks)
+        ax.set_yticks(self.yticks)
+        xtick_labels = list(self.xtick_labels)
+        ytick_labels = list(self.ytick_labels)
+        # Rows or columns without any run break the projections of mplot3d,
+        # they are projected from the cells with runs only
+        known = ~np.ma.getmaskarray(zticks)
+        rows, columns = known.any(axis=1), known.any(axis=0)
+        x_collections = y_collections = []
+        if rows.sum() > 1 and columns.sum() > 1:
+            cells = np.ix_(rows, columns)
+            x_collections = ax.contour(xticks[cells], yticks[cells], zticks[cells], zdir='x',
+                                       offset=0 - 0.230, cmap=cm.Dark2).collections
+            y_collections = ax.contour(xticks[cells], yticks[cells], zticks[cells], zdir='y',
+                                       offset=y_labels - 1 + 0.130, cmap=cm.cool).collections
         x_legends = ["chunk size: {}".format(x) for x in xtick_labels]
         y_legends = ["#threads: {}".format(y) for y in ytick_labels]
 
@@ -168,7 +244,7 @@ class ECB(AbstractModule):
             title = self.sub_type
 
         ax.set_zlabel('{} ({})'.format(title, unit))
-        plt.title('{} - {}'.format(title, self.coder))
+        plt.title('{} - {} ({}, {} blocks)'.format(title, self.coder, method, blocks))
         ax.set_xlabel('Chunk Size')
         ax.set_ylabel('#Threads')
         ax.set_xlim(0, x_labels - 1)
@@ -177,22 +253,88 @@ class ECB(AbstractModule):
         ax.set_xticklabels(xtick_labels)
         ax.set_yticklabels(ytick_labels)
 
-        x_num = len(x_plane.collections)
-        y_num = len(y_plane.collections)
-        lg = plt.legend(x_plane.collections + y_plane.collections,
+        x_num = len(x_collections)
+        y_num = len(y_collections)
+        lg = plt.legend(x_collections + y_collections,
                         x_legends[(len(x_legends) - x_num):] + y_legends[(len(y_legends) - y_num):],
-                        ncol = int(math.ceil(x_num + y_num) / 4), bbox_to_anchor=(0.95, 0), frameon=False)
+                        ncol = max(int(math.ceil(x_num + y_num) / 4), 1), bbox_to_anchor=(0.95, 0), frameon=False)
         if lg is not None:
             lg.get_frame().set_alpha(0)
             lg_txts = lg.get_texts()
             plt.setp(lg_txts, fontsize=6)
-        box = ax.get_position()
-        ax.set_position([box.x0 - box.width * 0.1, box.y0 + box.height * 0.14, box.width, box.height])
+        # Moved from the default position, the same for every plot
+        box = fig.subplotpars
+        width, height = box.right - box.left, box.top - box.bottom
+        ax.set_position([box.left - width * 0.1, box.bottom + height * 0.14, width, height])
+
+    def __paint_heatmap(self, fig, plot):
+        method, blocks = self.plots[plot]
+        grid = self.grids[plot]
+        if self.interpolate:
+            grid = fill_gaps(grid)
+        if self.sub_type != "Latency":
+            unit, grid = self.__throughput_array(grid)
+        else:
+            unit = "sec"
+        title = "Total Throughput" if self.sub_type == "TotalThroughput" else self.sub_type
+        paint_heatmap(fig, grid, [SizeUtils.number_to_size(x) for x in self.xdata], self.ydata,
+                      'Chunk Size', '#Threads',
+                      '{} - {} ({}, {} blocks)'.format(title, self.coder, method, blocks),
+                      '{} ({})'.format(title, unit))
+
+    def export_data(self, max_grid=64):
+        # Larger sweeps are averaged down to max_grid rows and columns
+        rows = export.bins(len(self.ydata), max_grid)
+        columns = export.bins(len(self.xdata), max_grid)
+        plots = []
+        for plot, (method, blocks) in enumerate(self.plots):
+            grid = fill_gaps(self.grids[plot]) if self.interpolate else self.grids[plot]
+            plots.append({'name': '{}, {} blocks'.format(method, blocks), 'method': method,
+                          'blocks': blocks,
+                          'z': export.compact(export.downsample(grid, rows, columns))})
+        return {
+            'title': "Total Throughput" if self.sub_type == "TotalThroughput" else self.sub_type,
+            'coder': self.coder,
+            'unit': "sec" if self.sub_type == "Latency" else "MB/sec",
+            'xlabel': 'Chunk Size',
+            'ylabel': '#Threads',
+            'x': export.bin_labels([SizeUtils.number_to_size(x) for x in self.xdata], columns),
+            'y': export.bin_labels(self.ydata, rows),
+            'plots': plots,
+        }
+
+    def paint_comparison(self, fig, mode='surface', reference=None, plot=0):
+        method, blocks = self.plots[plot]
+        title = "Total Throughput" if self.sub_type == "TotalThroughput" else self.sub_type
+        # Logs may not cover the same cells, missing ones are NaN
+        grids = list(self.comparison[:, plot])
+        if self.interpolate:
+            grids = [fill_gaps(grid) for grid in grids]
+
+        unit = "sec" if self.sub_type == "Latency" else "MB/sec"
+        if mode == 'surface' and self.sub_type != "Latency" and np.nanmean(grids) > 5 * 1024:
+            grids = [grid / 1024 for grid in grids]
+            unit = "GB/sec"
+        paint_comparison(fig, self, grids, self.labels, mode, reference, title, unit,
+                         'Chunk Size', '#Threads', '{}, {} blocks'.format(method, blocks),
+                         lower_is_better=self.sub_type == "Latency")
+
+    def history_data(self):
+        stats = self.stats
+        rows = list(zip(stats.keys['method'].tolist(), stats.keys['iteration'].tolist(),
+                   stats.keys['chunk_size'].tolist(), stats.keys['threads_num'].tolist(),
+                   stats.count.tolist(), stats.mean.tolist(), stats.min.tolist(),
+                   stats.max.tolist(), stats.std.tolist()))
+        return {
+            'coder': self.coder,
+            'unit': 's' if self.sub_type == "Latency" else 'MB/s',
+            'higher_is_better': self.sub_type != "Latency",
+            'rows': rows,
+        }
 
-    def __throughput_array(self, source, xdata, ydata):
-        temp_array = [source[x][y] for x, y in zip(np.ravel(xdata), np.ravel(ydata))]
+    def __throughput_array(self, grid):
         unit = "MB/sec"
-        if np.mean(temp_array) > 5 * 1024:
-            temp_array = [x / 1024 for x in temp_array]
+        if np.nanmean(grid) > 5 * 1024:
+            grid = grid / 1024
             unit = "GB/sec"
-        return (unit, np.array(temp_array))
+        return (unit, grid)
@@ -5,21 +5,76 @@ of all modules in this project.
 '''
 
 import importlib as im
+import os
+import re
+
+from module.AbstractModule import AbstractModule, UnknownModuleError
+
+"""Names of modules, they are file names and must not reach out of the package"""
+NAME_PATTERN = re.compile(r"^\w+$")
 
 class ModuleController(object):
     '''
-    Create instances.
+    Create instances. Modules are either classes living in a file of their
+    own, e.g. ``module/ECB.py``, or format specs, e.g. ``module/specs/DFSIO.json``
+    (see :mod:`module.SpecModule`).
     '''
 
     def __init__(self):
         self.instances = {}
+        self.classes = {}
+        self.specs = {}
 
     def get_module(self, module_name, sub_type):
-        if module_name not in self.instances:
-            module = im.import_module("module")
+        clazz = self.get_class(module_name)
+        spec = None
+        if clazz is None:
+            spec = self.get_spec(module_name)
+            if spec is None:
+                raise UnknownModuleError("{} is not an available module now.".format(module_name))
+
+        # Instances hold per sub type state, they can't be shared across sub
+        # types, nor across versions of a spec edited meanwhile
+        key = (module_name, sub_type, spec.digest if spec is not None else None)
+        if key not in self.instances:
+            if spec is not None:
+                from module.SpecModule import SpecModule
+                self.instances[key] = SpecModule(spec, sub_type)
+            else:
+                self.instances[key] = clazz(sub_type)
+        return self.instances[key]
+
+    def get_class(self, module_name):
+        # Each module lives in its own file, only the one asked for is loaded
+        if module_name not in self.classes:
+            if not NAME_PATTERN.match(module_name):
+                return None
             try:
-                clazz = getattr(module, module_name)
-            except:
-                raise Exception("{} is not an available module now.".format(module_name))
-            self.instances[module_name] = clazz(sub_type)
-        return self.instances[module_name]
+                module = im.import_module("module." + module_name)
+            except ImportError as error:
+                # Only a missing file means there is no such module, modules
+                # failing to import what they need must say so
+                if str(error).split()[-1].strip("'") not in (module_name, "module." + module_name):
+                    raise
+                module = None
+            self.classes[module_name] = self.__module_class(getattr(module, module_name, None))
+        return self.classes[module_name]
+
+    def __module_class(self, clazz):
+        # Files of the package such as AbstractModule aren't modules themselves
+        from module.SpecModule import SpecModule
+        if isinstance(clazz, type) and issubclass(clazz, AbstractModule) \
+                and clazz not in (AbstractModule, SpecModule):
+            return clazz
+        return None
+
+    def get_spec(self, module_name):
+        # Specs are compiled once, and again only if their file changed
+        from module.SpecModule import find_spec, load_spec
+        path = find_spec(module_name)
+        if path is None:
+            return None
+        mtime = os.path.getmtime(path)
+        if path not in self.specs or self.specs[path][0] != mtime:
+            self.specs[path] = (mtime, load_spec(path))
+        return self.specs[path][1]
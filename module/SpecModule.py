@@ -0,0 +1,318 @@
+#!/usr/bin/env python
+'''
+:mod:`module.SpecModule` is a module for logs described by a declarative
+format spec instead of code.
+'''
+
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+
+from module import AbstractModule, UnknownModuleError
+from core import export
+from core.grid import dense_grids, fill_gaps, tick_steps
+from core.matcher import LineMatcher
+from core.records import CONVERTERS, Aggregate, Records
+from core.viz import RENDERERS, paint_comparison, paint_heatmap, pyplot
+from util import SizeUtils
+
+"""Directories searched for ``<name>.json`` specs, after ``LOGVIZ_SPECS``"""
+SPEC_DIRS = [os.path.join(os.path.dirname(os.path.abspath(__file__)), 'specs')]
+
+"""Names of formats, they are file names and must not reach out of directories"""
+NAME_PATTERN = re.compile(r"^\w+$")
+
+"""Value of a sub type: a field, optionally divided or multiplied by another field or a number"""
+VALUE_PATTERN = re.compile(r"^\s*(?P<field>\w+)\s*(?:(?P<operator>[*/])\s*(?P<operand>[\w.]+)\s*)?$")
+
+
+class FormatSpec(object):
+    '''
+    Format spec of a log, compiled once. A spec is a JSON file such as::
+
+        {
+          "name": "DFSIO", "version": 1, "delimiter": "----- TestDFSIO -----",
+          "lines": [{"anchor": ": ", "regex": "...(?P<operation>...)...", "gap": false}],
+          "fields": {"operation": "string", "nr_files": "int", ...},
+          "keys": ["operation"],
+          "x": {"field": "total_mb", "label": "Total Size", "format": "size"},
+          "y": {"field": "nr_files", "label": "#Files"},
+          "sub_types": {"Throughput": {"value": "throughput", "unit": "MB/sec",
+                                       "renderer": "heatmap"},
+                        "ExecTime": {"value": "exec_time", "unit": "sec",
+                                     "higher_is_better": false}}
+        }
+
+    ``lines`` are the steps of :class:`core.matcher.LineMatcher`, ``keys``
+    tell plots apart, and every sub type draws one value over the x and y
+    fields, e.g. ``"total_throughput / threads_num"``. Values are better
+    when higher unless told otherwise, e.g. for comparisons and trends.
+        :param spec: Parsed JSON spec
+        :type spec: dict.
+    '''
+
+    def __init__(self, spec):
+        try:
+            self.name = spec['name']
+            self.version = spec['version']
+            self.delimiter = str(spec['delimiter'])
+            self.schema = spec['fields']
+            self.keys = list(spec.get('keys', []))
+            self.x = spec['x']
+            self.y = spec['y']
+            self.sub_types = spec['sub_types']
+            lines = spec['lines']
+        except KeyError as missing:
+            raise Exception("Format spec {} lacks {}".format(spec.get('name'), missing))
+        # Parsed data of an edited spec is stale even if its version wasn't increased
+        self.digest = hashlib.md5(json.dumps(spec, sort_keys=True).encode('utf-8')).hexdigest()[:8]
+
+        # Compiled here once, matchers of every parse share the patterns.
+        # Byte strings, the log is matched as such.
+        self.steps = [(str(line['anchor']), re.compile(str(line['regex']))) for line in lines]
+        self.gaps = tuple(index for index, line in enumerate(lines) if line.get('gap'))
+
+        matched = set(name for _, regex in self.steps for name in regex.groupindex)
+        for name, kind in self.schema.items():
+            if name not in matched:
+                raise Exception("Field {} of {} is not matched by any line".format(name, self.name))
+            if kind != 'string' and kind not in CONVERTERS:
+                raise Exception("Field {} of {} has unknown type {}".format(name, self.name, kind))
+
+        self.values = {}
+        for sub_type, plot in self.sub_types.items():
+            value = VALUE_PATTERN.match(plot['value'])
+            if value is None:
+                raise Exception("Cannot read value {!r} of {}".format(plot['value'], sub_type))
+            self.values[sub_type] = value.groupdict()
+            if plot.get('renderer', 'surface') not in RENDERERS:
+                raise Exception("Renderer of {} is not one of {}".format(sub_type, RENDERERS))
+
+    def value(self, sub_type, data):
+        '''
+        Computes the value drawn by a sub type for every record.
+            :return: ``numpy.ndarray``
+        '''
+        value = self.values[sub_type]
+        values = data[value['field']].astype(np.float64)
+        if value['operator'] is None:
+            return values
+        operand = value['operand']
+        operand = data[operand].astype(np.float64) if operand in data else float(operand)
+        return values / operand if value['operator'] == '/' else values * operand
+
+
+class SpecModule(AbstractModule):
+    '''
+    Module parsing and drawing logs as described by a :class:`FormatSpec`:
+    one 3-D surface of the sub type value over the x and y fields per
+    distinct values of the keys.
+        :param spec: Compiled format spec
+        :type spec: FormatSpec.
+        :param sub_type: One of the sub types of the spec
+        :type sub_type: str.
+    '''
+
+    def __init__(self, spec, sub_type):
+        if sub_type not in spec.sub_types:
+            raise UnknownModuleError("{} is not one of {}".format(
+                sub_type, [str(name) for name in sorted(spec.sub_types)]))
+        self.spec = spec
+        self.sub_type = sub_type
+        self.interpolate = False
+        """(:obj:`bool`): Paint cells without runs by interpolating their neighbours"""
+        self.renderer = spec.sub_types[sub_type].get('renderer', 'surface')
+        """(:obj:`str`): One of ``core.viz.RENDERERS``, set per sub type by the spec"""
+
+    def delimeter(self):
+        return self.spec.delimiter
+    def matcher(self):
+        return LineMatcher(self.spec.steps, gaps=self.spec.gaps)
+    def anchors(self):
+        # Records start on the first line, truncated ones included
+        return [self.spec.steps[0][0]] if self.spec.steps[0][0] else []
+    def version(self):
+        # Specs share this class, parsed data is told apart by spec name
+        return "{}:{}:{}".format(self.spec.name, self.spec.version, self.spec.digest)
+    def schema(self):
+        return self.spec.schema
+    def index_fields(self):
+        return self.spec.keys + [self.spec.x['field'], self.spec.y['field']]
+    def split_info(self, parts):
+        return Records.from_strings(
+            dict((name, [part[name] for part in parts]) for name in self.spec.schema),
+            self.spec.schema)
+    def num_plots(self):
+        return len(self.plots)
+    def plot_name(self, plot):
+        return "_".join(str(key) for key in self.plots[plot]) or str(plot)
+    def xy_data(self, data):
+        self.xdata = np.unique(data[self.spec.x['field']]).tolist()
+        self.ydata = np.unique(data[self.spec.y['field']]).tolist()
+    def preprocess_data(self, data):
+        self.stats = self.__aggregate(data)
+        self.__set_results()
+    def update_data(self, data):
+        xdata, ydata = self.xdata, self.ydata
+        self.xy_data(data)
+        self.xdata = sorted(set(xdata).union(self.xdata))
+        self.ydata = sorted(set(ydata).union(self.ydata))
+        self.stats = self.stats.merge(self.__aggregate(data))
+        self.__set_results()
+
+    def compare_data(self, data, by='source'):
+        # Formats have no coders, logs are then compared to each other
+        self.xy_data(data)
+        stats = self.__aggregate(data, data.decode(by if by in data else 'source'))
+        self.labels = np.unique(stats.keys['label']).tolist()
+        self.plots, self.comparison = dense_grids(
+            stats, self.spec.keys, self.spec.x['field'], self.xdata, self.spec.y['field'],
+            self.ydata, self.labels)
+        self.stats = stats
+
+    def __aggregate(self, data, labels=None):
+        keys = dict((name, data.decode(name)) for name in self.spec.keys)
+        keys[self.spec.x['field']] = data[self.spec.x['field']]
+        keys[self.spec.y['field']] = data[self.spec.y['field']]
+        if labels is not None:
+            keys['label'] = labels
+        return Aggregate.from_values(keys, self.spec.value(self.sub_type, data))
+
+    def __set_results(self):
+        self.plots, grids = dense_grids(self.stats, self.spec.keys, self.spec.x['field'],
+                                        self.xdata, self.spec.y['field'], self.ydata)
+        self.grids = grids[0]
+
+    def __labels(self, axis, values):
+        if axis.get('format') == 'size':
+            return [SizeUtils.number_to_size(value) for value in values]
+        return ['{:g}'.format(value) if isinstance(value, float) else str(value) for value in values]
+
+    def generate_ticks(self):
+        self.xticks = tick_steps(len(self.xdata))
+        self.xtick_labels = self.__labels(self.spec.x, [self.xdata[i] for i in self.xticks])
+        self.yticks = tick_steps(len(self.ydata))
+        self.ytick_labels = self.__labels(self.spec.y, [self.ydata[i] for i in self.yticks])
+
+    def __higher_is_better(self):
+        return self.spec.sub_types[self.sub_type].get('higher_is_better', True)
+
+    def __title(self, plot):
+        keys = ", ".join(str(key) for key in self.plots[plot])
+        title = "{} {}".format(self.spec.name, self.sub_type)
+        return "{} ({})".format(title, keys) if keys else title
+
+    def paint(self, fig, plot=0):
+        zticks = self.grids[plot]
+        if self.interpolate:
+            zticks = fill_gaps(zticks)
+        unit = self.spec.sub_types[self.sub_type].get('unit', '')
+        if self.renderer == 'heatmap':
+            paint_heatmap(fig, zticks, self.__labels(self.spec.x, self.xdata),
+                          self.__labels(self.spec.y, self.ydata),
+                          self.spec.x.get('label', self.spec.x['field']),
+                          self.spec.y.get('label', self.spec.y['field']),
+                          self.__title(plot), '{} ({})'.format(self.sub_type, unit))
+            return
+
+        # Registers the 3d projection
+        from mpl_toolkits.mplot3d import axes3d
+        plt = pyplot()
+
+        ax = fig.gca(projection='3d')
+        ax.clear()
+        xticks, yticks = np.meshgrid(np.arange(len(self.xdata)), np.arange(len(self.ydata)))
+        ax.plot_surface(xticks, yticks, np.ma.masked_invalid(zticks), alpha=0.6)
+
+        ax.set_xticks(self.xticks)
+        ax.set_xticklabels(self.xtick_labels, fontsize=6)
+        ax.set_yticks(self.yticks)
+        ax.set_yticklabels(self.ytick_labels, fontsize=6)
+        ax.set_xlabel(self.spec.x.get('label', self.spec.x['field']))
+        ax.set_ylabel(self.spec.y.get('label', self.spec.y['field']))
+        ax.set_zlabel('{} ({})'.format(self.sub_type, unit))
+        plt.title(self.__title(plot))
+
+    def export_data(self, max_grid=64):
+        rows = export.bins(len(self.ydata), max_grid)
+        columns = export.bins(len(self.xdata), max_grid)
+        plots = []
+        for plot in range(self.num_plots()):
+            grid = fill_gaps(self.grids[plot]) if self.interpolate else self.grids[plot]
+            plots.append({'name': self.__title(plot),
+                          'z': export.compact(export.downsample(grid, rows, columns))})
+        return {
+            'title': "{} {}".format(self.spec.name, self.sub_type),
+            'coder': None,
+            'unit': self.spec.sub_types[self.sub_type].get('unit', ''),
+            'xlabel': self.spec.x.get('label', self.spec.x['field']),
+            'ylabel': self.spec.y.get('label', self.spec.y['field']),
+            'x': export.bin_labels(self.__labels(self.spec.x, self.xdata), columns),
+            'y': export.bin_labels(self.__labels(self.spec.y, self.ydata), rows),
+            'plots': plots,
+        }
+
+
+    def paint_comparison(self, fig, mode='surface', reference=None, plot=0):
+        grids = list(self.comparison[:, plot])
+        if self.interpolate:
+            grids = [fill_gaps(grid) for grid in grids]
+        paint_comparison(fig, self, grids, self.labels, mode, reference,
+                         "{} {}".format(self.spec.name, self.sub_type),
+                         self.spec.sub_types[self.sub_type].get('unit', ''),
+                         self.spec.x.get('label', self.spec.x['field']),
+                         self.spec.y.get('label', self.spec.y['field']),
+                         ", ".join(str(key) for key in self.plots[plot]),
+                         lower_is_better=not self.__higher_is_better())
+
+    def history_data(self):
+        # Stored in the columns of ECB sweeps: keys joined as method, x as
+        # chunk size and y as threads, the format name as coder
+        stats = self.stats
+        if self.spec.keys:
+            methods = [" ".join(str(key) for key in keys) for keys in
+                       zip(*[stats.keys[name].tolist() for name in self.spec.keys])]
+        else:
+            methods = [""] * len(stats)
+        rows = list(zip(methods, [0] * len(stats), stats.keys[self.spec.x['field']].tolist(),
+                        stats.keys[self.spec.y['field']].tolist(), stats.count.tolist(),
+                        stats.mean.tolist(), stats.min.tolist(), stats.max.tolist(),
+                        stats.std.tolist()))
+        return {
+            'coder': self.spec.name,
+            'unit': self.spec.sub_types[self.sub_type].get('unit', ''),
+            'higher_is_better': self.__higher_is_better(),
+            'rows': rows,
+        }
+
+
+def find_spec(name):
+    '''
+    Finds the spec file of a format, in ``LOGVIZ_SPECS`` directories
+    (separated like ``PATH``) then in ``SPEC_DIRS``.
+        :return: Path of ``<name>.json``, ``None`` if there is none
+    '''
+    if not NAME_PATTERN.match(name):
+        return None
+    dirs = [path for path in os.environ.get('LOGVIZ_SPECS', '').split(os.pathsep) if path]
+    for directory in dirs + SPEC_DIRS:
+        path = os.path.join(directory, name + '.json')
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def load_spec(path):
+    '''
+    Reads and compiles a spec file.
+        :return: ``FormatSpec``
+    '''
+    with open(path) as fhandle:
+        try:
+            spec = json.load(fhandle)
+        except ValueError as error:
+            raise Exception("Cannot read format spec {}: {}".format(path, error))
+    return FormatSpec(spec)
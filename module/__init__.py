@@ -1,4 +1,4 @@
 #!/usr/bin/env python
 from module.ModuleController import ModuleController
-from module.AbstractModule import AbstractModule
-from module.ECB import ECB
+from module.AbstractModule import AbstractModule, UnknownModuleError
+# Modules such as module.ECB are imported by ModuleController when needed
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+'''
+Tests of :mod:`module.ECB`.
+
+Usage:
+    python -m unittest discover -s tests
+'''
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from core import viz
+from core.records import Records
+from module.ECB import ECB
+
+
+def sweep(cells):
+    '''
+    Builds records of a sweep, one run per cell.
+        :param cells: ``List``-style of ``(method, chunk size, threads)``
+        :return: ``Records``
+    '''
+    lists = dict((field, []) for field in ECB.FIELDS_ECB)
+    for method, chunk_size, threads in cells:
+        values = {
+            'buffer_size': '1KB', 'coder': 'ISA-L', 'method': method,
+            'total_data_size': '{}KB'.format(1024 * threads), 'chunk_size': chunk_size,
+            'total_time': '1.0', 'total_throughput': str(1000.0 / threads),
+            'threads_num': str(threads), 'time_min': '1.0', 'time_max': '1.0',
+            'time_avg': '1.0', 'time_90': '1.0',
+        }
+        for field in ECB.FIELDS_ECB:
+            lists[field].append(values[field])
+    return Records.from_strings(lists, ECB.SCHEMA_ECB)
+
+
+class ECBTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_paint_sparse_grid(self):
+        # decode has no run with 2 threads, its grid has a row without runs
+        cells = [(method, chunk_size, threads)
+                 for method in ['encode', 'decode']
+                 for chunk_size in ['1KB', '2KB', '4KB']
+                 for threads in [1, 2, 4]
+                 if not (method == 'decode' and threads == 2)]
+        for renderer in viz.RENDERERS:
+            module = ECB('Throughput')
+            module.renderer = renderer
+            visualization = viz.Visualization(sweep(cells), module)
+            output_path = os.path.join(self.directory, renderer + '.png')
+            visualization.save(output_path, output_type=viz.Visualization.PNG_OUTPUT)
+            names = [name for name in os.listdir(self.directory) if name.startswith(renderer)]
+            self.assertEqual(len(names), module.num_plots())
+
+
+if __name__ == '__main__':
+    unittest.main()
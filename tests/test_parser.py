@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+'''
+Tests of :mod:`core.parser`: every way of parsing a log gives the records
+of a serial parse.
+
+Usage:
+    python -m unittest discover -s tests
+'''
+
+import gzip
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from benchmarks import synthetic
+from core import cache
+from core import index
+from core import parser
+from core import query
+from module.ECB import ECB
+
+
+def synthetic_log(**kwargs):
+    '''
+    Writes a synthetic log in memory.
+        :param kwargs: Arguments of ``benchmarks.synthetic.generate()``
+        :return: ``str``
+    '''
+    out = io.BytesIO()
+    synthetic.generate(out, **kwargs)
+    return out.getvalue()
+
+
+def assert_same_records(test, records, expected):
+    '''
+    Checks records hold the same values, strings decoded, in the same order.
+    '''
+    test.assertEqual(sorted(records.fields()), sorted(expected.fields()))
+    test.assertEqual(len(records), len(expected))
+    for field in expected.fields():
+        np.testing.assert_array_equal(records.decode(field), expected.decode(field))
+
+
+class StreamTest(unittest.TestCase):
+
+    def test_windows_without_delimeter(self):
+        data = synthetic_log(records=200, seed=1, noise=0.3).replace(synthetic.DELIMETER + '\n', '')
+        inlog = parser.Parser('', ECB('Throughput'))
+        inlog.STREAM_BUFFER = 1024
+
+        pieces = []
+        for window, cut, base in inlog._stream_windows(io.BytesIO(data)):
+            self.assertLessEqual(len(window), (inlog.STREAM_WINDOWS + 1) * inlog.STREAM_BUFFER)
+            self.assertEqual(base, sum(len(piece) for piece in pieces))
+            pieces.append(window[:cut])
+        self.assertGreater(len(pieces), 1)
+        self.assertEqual(''.join(pieces), data)
+        self.assertTrue(all(piece.endswith('\n') for piece in pieces))
+
+
+class ParserTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        data = synthetic_log(records=3000, seed=2, noise=0.2, truncated=0.01,
+                             coders=('ISA-L', 'Java'), chunk_sizes=(64, 128, 256, 1024))
+        cls.path = os.path.join(cls.directory, 'ecb.log')
+        with open(cls.path, 'wb') as fhandle:
+            fhandle.write(data)
+        cls.compressed = cls.path + '.gz'
+        with gzip.open(cls.compressed, 'wb') as fhandle:
+            fhandle.write(data)
+
+        serial = parser.Parser(cls.path, ECB('Throughput'))
+        cls.serial = serial.get_info()
+        cls.malformed = serial.get_malformed()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+
+    def test_serial(self):
+        # Truncated records are reported, not parsed
+        self.assertGreater(len(self.serial), 2500)
+        self.assertTrue(self.malformed)
+        self.assertEqual(len(self.serial) + len(self.malformed), 3000)
+
+    def test_parallel_ranges(self):
+        inlog = parser.Parser(self.path, ECB('Throughput'), jobs=3)
+        assert_same_records(self, inlog.get_info(), self.serial)
+        self.assertEqual(inlog.get_malformed(), self.malformed)
+
+    def test_batches(self):
+        inlog = parser.Parser(self.path, ECB('Throughput'))
+        inlog.BATCH_RECORDS = 100
+        assert_same_records(self, inlog.get_info(), self.serial)
+
+    def test_compressed(self):
+        for jobs in [1, 2]:
+            inlog = parser.Parser(self.compressed, ECB('Throughput'), jobs=jobs)
+            inlog.STREAM_BUFFER = 16 * 1024
+            assert_same_records(self, inlog.get_info(), self.serial)
+            self.assertEqual(inlog.get_malformed(), self.malformed)
+
+    def test_preview_then_full(self):
+        inlog = parser.Parser(self.path, ECB('Throughput'))
+        preview = inlog.preview(windows=4, window_bytes=16 * 1024)
+        parsed, size = inlog.get_coverage()
+        self.assertLess(parsed, size)
+        self.assertLess(len(preview), len(self.serial))
+
+        assert_same_records(self, inlog.get_info(), self.serial)
+        self.assertEqual(sorted(inlog.get_malformed()), sorted(self.malformed))
+
+    def test_cache(self):
+        parse_cache = cache.ParseCache(os.path.join(self.directory, 'cache'))
+        module = ECB('Throughput')
+        key = parse_cache.key(self.path, module)
+        self.assertIsNone(parse_cache.load(key))
+
+        parser.Parser(self.path, module, cache=parse_cache).get_info()
+        self.assertIsNotNone(parse_cache.load(key))
+        inlog = parser.Parser(self.path, module, cache=parse_cache)
+        assert_same_records(self, inlog.get_info(), self.serial)
+        self.assertEqual(inlog.get_malformed(), self.malformed)
+
+    def test_index_pushdown(self):
+        module = ECB('Throughput')
+        filters = query.parse_filters(['method=decode,chunk_size>=128KB', 'threads<=4'],
+                                      module.schema())
+        expected = self.serial.take(query.select(self.serial, filters))
+        self.assertTrue(0 < len(expected) < len(self.serial))
+
+        sidecar = index.SidecarIndex()
+        path = os.path.join(self.directory, 'indexed.log')
+        shutil.copy(self.path, path)
+        parser.Parser(path, module, index=sidecar).get_info()
+        self.assertIsNotNone(sidecar.load(path, module))
+
+        inlog = parser.Parser(path, module, index=sidecar, filters=filters)
+        assert_same_records(self, inlog.get_info(), expected)
+        # Only sections of matching records were parsed
+        self.assertEqual(len(inlog._load_indexed()), len(expected))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+'''
+Tests of :mod:`core.query`.
+
+Usage:
+    python -m unittest discover -s tests
+'''
+
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from core import query
+from core.records import Records
+from module.ECB import ECB
+
+
+class QueryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.schema = ECB.SCHEMA_ECB
+        self.records = Records.from_strings(
+            {'method': ['encode', 'decode', 'decode', 'encode'],
+             'chunk_size': ['64KB', '64KB', '1MB', '1MB'],
+             'threads_num': ['1', '8', '32', '64']},
+            self.schema)
+
+    def select(self, *expressions):
+        predicates = query.parse_filters(list(expressions), self.schema)
+        return query.select(self.records, predicates).tolist()
+
+    def test_parse_filters(self):
+        predicates = query.parse_filters(['method = decode, chunk_size>=64KB', 'threads<=32'],
+                                         self.schema)
+        self.assertEqual([(predicate.field, predicate.operator, predicate.value)
+                          for predicate in predicates],
+                         [('method', '=', 'decode'), ('chunk_size', '>=', 65536),
+                          ('threads_num', '<=', 32)])
+        self.assertEqual(query.parse_filters(None, self.schema), [])
+
+    def test_select(self):
+        self.assertEqual(self.select('method=decode'), [False, True, True, False])
+        self.assertEqual(self.select('chunk_size>64KB'), [False, False, True, True])
+        self.assertEqual(self.select('method!=decode,threads_num>=64'), [False, False, False, True])
+        self.assertEqual(self.select('method==decode', 'threads<32'), [False, True, False, False])
+        self.assertEqual(self.select(), [True] * 4)
+
+    def test_errors(self):
+        for expression in ['threads', 'nope=1', 'time=1', 'threads=many', 'chunk_size>=64XB']:
+            with self.assertRaises(Exception):
+                query.parse_filters([expression], self.schema)
+
+
+if __name__ == '__main__':
+    unittest.main()
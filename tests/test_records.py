@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+'''
+Tests of :mod:`core.records`.
+
+Usage:
+    python -m unittest discover -s tests
+'''
+
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from core.records import Aggregate, Records
+
+SCHEMA = {'method': 'string', 'chunk_size': 'size', 'threads': 'int', 'time': 'float'}
+
+
+def records(methods, chunk_sizes, threads, times):
+    return Records.from_strings({'method': methods, 'chunk_size': chunk_sizes,
+                                 'threads': threads, 'time': times}, SCHEMA)
+
+
+class RecordsTest(unittest.TestCase):
+
+    def test_from_strings(self):
+        data = records(['encode', 'decode', 'encode'], ['64KB', '1MB', '64KB'],
+                       ['1', '2', '4'], ['0.5', 'n/a', '1.5'])
+        self.assertEqual(len(data), 3)
+        self.assertEqual(data.labels('method'), ['decode', 'encode'])
+        self.assertEqual(data.decode('method').tolist(), ['encode', 'decode', 'encode'])
+        self.assertEqual(data['chunk_size'].tolist(), [65536, 1048576, 65536])
+        self.assertEqual(data['threads'].dtype, np.int64)
+        self.assertTrue(np.isnan(data['time'][1]))
+
+    def test_concatenate(self):
+        first = records(['encode'], ['64KB'], ['1'], ['0.5'])
+        second = records(['decode', 'verify'], ['1MB', '2MB'], ['2', '4'], ['1.0', '2.0'])
+        data = Records.concatenate([first, Records(), second])
+        self.assertEqual(data.labels('method'), ['decode', 'encode', 'verify'])
+        self.assertEqual(data.decode('method').tolist(), ['encode', 'decode', 'verify'])
+        self.assertEqual(data['threads'].tolist(), [1, 2, 4])
+        self.assertEqual(len(Records.concatenate([])), 0)
+
+    def test_take_and_arrays(self):
+        data = records(['encode', 'decode', 'encode'], ['64KB', '1MB', '2MB'],
+                       ['1', '2', '4'], ['0.5', '1.0', '1.5'])
+        taken = data.take(data.decode('method') == 'encode')
+        self.assertEqual(taken['chunk_size'].tolist(), [65536, 2097152])
+
+        loaded = Records.from_arrays(data.to_arrays())
+        self.assertEqual(loaded.to_dict(), data.to_dict())
+
+
+class AggregateTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.keys = {'method': rng.randint(0, 2, 1000), 'threads': rng.randint(0, 5, 1000)}
+        self.values = rng.uniform(0, 100, 1000)
+
+    def test_from_values(self):
+        stats = Aggregate.from_values(self.keys, self.values)
+        self.assertEqual(len(stats), 10)
+        self.assertEqual(stats.count.sum(), 1000)
+        for index in range(len(stats)):
+            group = self.values[(self.keys['method'] == stats.keys['method'][index]) &
+                                (self.keys['threads'] == stats.keys['threads'][index])]
+            self.assertAlmostEqual(stats.mean[index], group.mean())
+            self.assertAlmostEqual(stats.std[index], group.std())
+            self.assertEqual(stats.min[index], group.min())
+            self.assertEqual(stats.max[index], group.max())
+            self.assertAlmostEqual(stats.percentiles[90][index], np.percentile(group, 90))
+
+    def test_merge(self):
+        # Parts don't cover the same groups
+        first = self.keys['threads'] < 3
+        parts = [Aggregate.from_values(dict((name, keys[mask]) for name, keys in self.keys.items()),
+                                       self.values[mask]) for mask in [first, ~first]]
+        merged = parts[0].merge(parts[1]).merge(Aggregate.from_values(
+            dict((name, keys[:0]) for name, keys in self.keys.items()), self.values[:0]))
+        expected = Aggregate.from_values(self.keys, self.values)
+
+        for name in expected.keys:
+            np.testing.assert_array_equal(merged.keys[name], expected.keys[name])
+        np.testing.assert_array_equal(merged.count, expected.count)
+        np.testing.assert_allclose(merged.mean, expected.mean)
+        np.testing.assert_allclose(merged.std, expected.std)
+        np.testing.assert_array_equal(merged.min, expected.min)
+        np.testing.assert_array_equal(merged.max, expected.max)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+'''
+Tests of :mod:`core.server`.
+
+Usage:
+    python -m unittest discover -s tests
+'''
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+try:
+    from urllib2 import HTTPError, urlopen
+except ImportError:
+    from urllib.error import HTTPError
+    from urllib.request import urlopen
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from benchmarks import synthetic
+from core import server
+from module import UnknownModuleError
+
+
+class ServerTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        with open(os.path.join(cls.directory, 'ecb.log'), 'w') as fhandle:
+            synthetic.generate(fhandle, records=200, seed=4)
+        with open(os.path.join(cls.directory, 'none.log'), 'w') as fhandle:
+            fhandle.write('No record here\n')
+        cls.service = server.Service(cls.directory)
+
+        class QuietHandler(server.Handler):
+            service = cls.service
+
+            def log_message(self, *args):
+                pass
+
+        cls.httpd = server.ThreadingHTTPServer(('127.0.0.1', 0), QuietHandler)
+        cls.thread = threading.Thread(target=cls.httpd.serve_forever)
+        cls.thread.daemon = True
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.httpd.shutdown()
+        cls.httpd.server_close()
+        cls.service.close()
+        shutil.rmtree(cls.directory)
+
+    def get(self, query):
+        '''
+        Requests a figure.
+            :return: ``(status, body)``
+        '''
+        url = 'http://127.0.0.1:{}/render?{}'.format(self.httpd.server_address[1], query)
+        try:
+            response = urlopen(url)
+            return (response.getcode(), response.read())
+        except HTTPError as error:
+            return (error.code, error.read())
+
+    def test_render(self):
+        status, body = self.get('log=ecb.log&type=ECB&sub_type=Throughput&format=json')
+        self.assertEqual(status, 200)
+        self.assertEqual(len(json.loads(body.decode('utf-8'))['plots']), 2)
+        status, body = self.get('log=ecb.log&sub_type=Latency&plot=1')
+        self.assertEqual(status, 200)
+        self.assertTrue(body.startswith(b'\x89PNG'))
+
+    def test_bad_requests(self):
+        for query in ['log=ecb.log&type=Nope&sub_type=Throughput',
+                      'log=ecb.log&type=AbstractModule&sub_type=Throughput',
+                      'log=ecb.log&type=..%2Fecb&sub_type=Throughput',
+                      'log=ecb.log&sub_type=Nope',
+                      'log=ecb.log&type=DFSIO&sub_type=Nope',
+                      'log=ecb.log',
+                      'log=ecb.log&sub_type=Throughput&plot=first',
+                      'log=ecb.log&sub_type=Throughput&plot=9',
+                      'log=ecb.log&sub_type=Throughput&format=gif',
+                      'log=ecb.log&sub_type=Throughput&renderer=wireframe',
+                      'log=missing.log&sub_type=Throughput',
+                      'log=..%2F..%2Fetc%2Fpasswd&sub_type=Throughput',
+                      'log=none.log&sub_type=Throughput']:
+            status, body = self.get(query)
+            self.assertEqual(status, 400, query)
+            self.assertTrue(body.startswith(b'Bad request: '), query)
+
+    def test_failures(self):
+        # Bugs are failures of the service, whatever the exception
+        render = self.service.render
+        for error in [KeyError('plots'), ValueError('bug'), RuntimeError('bug')]:
+            def failing(*args, **kwargs):
+                raise error
+            self.service.render = failing
+            try:
+                status, _ = self.get('log=ecb.log&sub_type=Throughput')
+            finally:
+                self.service.render = render
+            self.assertEqual(status, 500)
+
+    def test_unknown_module(self):
+        with self.assertRaises(UnknownModuleError):
+            self.service.render('ecb.log', 'ECB', 'Nope')
+        with self.assertRaises(server.BadRequest):
+            self.service.render('none.log', 'ECB', 'Throughput')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,24 @@
 #!/usr/bin/env python
-def as_number_otherwise_string(string):
+import numpy as np
+
+def as_floats(strings):
+    # Converted in one go by NumPy, value by value only if some are invalid
     try:
-        return int(string)
-    except:
-        try:
-            return float(string)
-        except:
-            return string
+        return np.array(strings, dtype=np.float64)
+    except ValueError:
+        return np.array([_float_or_nan(string) for string in strings], dtype=np.float64)
+def as_ints(strings):
+    try:
+        return np.array(strings).astype(np.int64)
+    except ValueError:
+        return as_integral(as_floats(strings))
+def as_integral(values):
+    # Whole numbers become int64, NaN of invalid values keeps them float
+    if len(values) and np.isfinite(values).all() and (values == np.floor(values)).all():
+        return values.astype(np.int64)
+    return values
+def _float_or_nan(string):
+    try:
+        return float(string)
+    except (TypeError, ValueError):
+        return np.nan
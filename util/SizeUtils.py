@@ -1,11 +1,40 @@
 #!/usr/bin/env python
+import re
+
+import numpy as np
+
+from util import NumberUtils
+
+"""Bytes per unit, 1KB is 1024B as in benchmark logs"""
+UNITS = {
+    'B': 1,
+    'KB': 1024, 'KIB': 1024,
+    'MB': 1024 ** 2, 'MIB': 1024 ** 2,
+    'GB': 1024 ** 3, 'GIB': 1024 ** 3,
+    'TB': 1024 ** 4, 'TIB': 1024 ** 4,
+    'PB': 1024 ** 5, 'PIB': 1024 ** 5,
+}
+SIZE_PATTERN = re.compile(r"\s*([-+]?[0-9]*\.?[0-9]+(?:[eE][-+]?[0-9]+)?)\s*([a-zA-Z]*)\s*$")
+
 def convert_size(string):
-    if string[-2:] == 'KB':
-        return float(string[:-2]) * 1024
-    if string[-2:] == 'MB':
-        return float(string[:-2]) * 1024 * 1024
-    if string[-2:] == 'GB':
-        return float(string[:-2]) * 1024 * 1024 * 1024
+    match = SIZE_PATTERN.match(string)
+    if match is None:
+        return None
+    number, unit = match.groups()
+    if not unit:
+        return float(number)
+    factor = UNITS.get(unit.upper())
+    if factor is None:
+        return None
+    return float(number) * factor
+def convert_sizes(strings):
+    # Sizes take few distinct values, each one is only converted once
+    if not len(strings):
+        return np.zeros(0, dtype=np.int64)
+    distinct, inverse = np.unique(np.asarray(strings), return_inverse=True)
+    values = [convert_size(string) for string in distinct.tolist()]
+    values = np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+    return NumberUtils.as_integral(np.floor(values)[inverse])
 def number_to_size(num):
     string = "{}B".format(num)
     if num >= 1024 and num % 1024 == 0:
@@ -17,4 +46,7 @@ def number_to_size(num):
     if num >= 1024 and num % 1024 == 0:
         num /= 1024
         string = "{}GB".format(num)
+    if num >= 1024 and num % 1024 == 0:
+        num /= 1024
+        string = "{}TB".format(num)
     return string